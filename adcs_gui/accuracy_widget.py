@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import os
+from PySide2.QtWidgets import QWidget, QTableWidgetItem, QHeaderView
+from PySide2.QtCore import Signal, Slot, QFile
+from PySide2.QtUiTools import QUiLoader
+
+COLUMNS = ['Angle', 'Error', 'Step error', 'Deviation']
+
+class AccuracyWidget(QWidget):
+    abortClicked = Signal()
+
+    def __init__(self, parent=None):
+        super(AccuracyWidget, self).__init__(parent)
+
+        base_dir = os.path.dirname(os.path.realpath(__file__))
+        form_dir = os.path.join(base_dir, 'forms', 'accuracy_widget.ui')
+        file = QFile(form_dir)
+        file.open(QFile.ReadOnly)
+        loader = QUiLoader()
+        self.widget = loader.load(file, self)
+        file.close()
+
+        self.setMinimumSize(460, 400)
+        self.setWindowTitle('Sweep Accuracy')
+
+        table = self.widget.twAccuracy
+        table.setColumnCount(len(COLUMNS))
+        table.setHorizontalHeaderLabels(COLUMNS)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        self.widget.pbAbort.clicked.connect(self.abortClicked)
+
+    @Slot()
+    def clear(self):
+        self.widget.twAccuracy.setRowCount(0)
+        self.widget.lSummary.setText('-')
+        self.widget.pbAbort.setEnabled(True)
+
+    @Slot()
+    def sweepFinished(self):
+        self.widget.pbAbort.setEnabled(False)
+
+    @Slot(object)
+    def addResult(self, result):
+        # one row per finished angle, the newest at the bottom
+        table = self.widget.twAccuracy
+        row = table.rowCount()
+        table.insertRow(row)
+        deviation = '' if result.attitude_std is None else '{:.3f}°'.format(result.attitude_std)
+        values = ['{}°'.format(result.angle), '{:.3f}°'.format(result.error),
+                  '{:.3f}°'.format(result.step_error), deviation]
+        for column, value in enumerate(values):
+            table.setItem(row, column, QTableWidgetItem(value))
+        table.scrollToBottom()
+
+        self.widget.lSummary.setText('{} angles   avg: {:.3f}°   std: {:.3f}°   max: {:.3f}°'.format(
+            result.count, result.mean, result.std, result.max))
+
+    def resizeEvent(self, event):
+        self.widget.resize(event.size())
@@ -1,12 +1,16 @@
+# -*- coding: utf-8 -*-
 import os
-import serial
 from PySide2.QtWidgets import (QApplication, QLabel, QPushButton, QLineEdit, QWidget)
-from PySide2.QtCore import QFile, Signal, Slot
+from PySide2.QtCore import QFile, Signal, Slot, QTimer
 from PySide2.QtUiTools import QUiLoader
 
+from core.acs_controller import ACSController
+
 class ACSControlWidget(QWidget):
+    # the sweep threads open the port too, the timer lives in the GUI thread
+    portOpened = Signal()
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, feedback=False):
         QWidget.__init__(self, parent)
 
         base_dir = os.path.dirname(os.path.realpath(__file__))
@@ -20,7 +24,7 @@ class ACSControlWidget(QWidget):
         self.setMinimumSize(300, 180)
         self.setMaximumSize(16777215, 180)
 
-        self.controller = ACSController()
+        self.controller = ACSController(feedback)
 
         self.widget.pbOpen.clicked.connect(self.onOpenPortClicked)
         self.widget.pbMotorOn.clicked.connect(self.onMotorOnClicked)
@@ -32,11 +36,26 @@ class ACSControlWidget(QWidget):
         self.widget.leFeedback.setText('DISPLAY OF FEEDBACK INFO')
         self.widget.lePort.setText('/dev/ttyUSB0')
 
+        self.feedbackTimer = QTimer(self)
+        self.feedbackTimer.setInterval(200)
+        self.feedbackTimer.timeout.connect(self.showFeedback)
+        self.portOpened.connect(self.onPortOpened)
+
     @Slot()
     def onOpenPortClicked(self):
         self.controller.open_port(self.widget.lePort.text())
-        self.feedback_test = 'Port is open\n'.encode('UTF-8')
-        self.widget.leFeedback.setText(self.feedback_test)
+        self.portOpened.emit()
+
+    @Slot()
+    def onPortOpened(self):
+        self.widget.leFeedback.setText('Port is open')
+        self.feedbackTimer.start()
+
+    @Slot()
+    def showFeedback(self):
+        angle = self.controller.angle
+        if angle is not None:
+            self.widget.leFeedback.setText('{:.2f}° (status {})'.format(angle, self.controller.status))
 
     @Slot()
     def onMotorOnClicked(self):
@@ -64,49 +83,3 @@ class ACSControlWidget(QWidget):
 
     def resizeEvent(self, event):
         self.widget.resize(event.size())
-
-class ACSController(object):
-    def __init__(self):
-        self.serial_interface=serial.Serial(port=None, baudrate=19200, \
-            bytesize=serial.EIGHTBITS, parity=serial.PARITY_NONE, \
-            stopbits=serial.STOPBITS_ONE, timeout=None, xonxoff=False, \
-            rtscts=True, write_timeout=None, \
-            dsrdtr=True, inter_byte_timeout=None)
-
-    def open_port(self, port):
-        if self.serial_interface.is_open:
-            self.serial_interface.close()
-        self.serial_interface.port = port
-        self.serial_interface.open()
-
-    def send_encode_string(self, data):
-        data=data+'\r\n'
-        self.serial_interface.write(data.encode('UTF-8'))
-
-    def read_decode_string(self):
-        return self.serial_interface.readline().decode('UTF-8')
-
-    def motor_on(self):
-        self.send_encode_string('SH')
-
-    def motor_off(self):
-        self.send_encode_string('MO')
-
-    def stop_motor(self):
-        self.send_encode_string('ST')
-
-    def sp(self, speed):
-        number = int(speed)
-        number = number*10000
-        self.send_encode_string('SP'+str(number))
-
-    def pa(self, degree):
-        number = int(degree)
-        number = number*10000
-        self.send_encode_string('PA'+str(number))
-        self.send_encode_string('BG')
-
-    def not_moving_fix(self):
-        self.send_encode_string('ST')
-        self.send_encode_string('SH')
-        self.send_encode_string('SP100000')
\ No newline at end of file
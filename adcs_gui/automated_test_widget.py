@@ -1,13 +1,17 @@
 import os
 import sys
 import logging
-import time
 import yaml
 from threading import Event
 from PySide2.QtWidgets import QWidget, QFileDialog, QMessageBox
 from PySide2.QtCore import Signal, Slot, QFile, QSaveFile, QTextStream, QObject, QThread, QWaitCondition, QMutex
 from PySide2.QtUiTools import QUiLoader
 
+from core.sweep_writer import SweepWriter
+from core.online_stats import sequential_stop
+from core.accuracy_monitor import AccuracyMonitor
+from adcs_gui.accuracy_widget import AccuracyWidget
+
 class AutomatedTestWidget(QWidget):
     config = None
     thread = None
@@ -34,6 +38,9 @@ class AutomatedTestWidget(QWidget):
         self.acs_control_widget = acs_control_widget
         self.recorder_widget = recorder_widget
 
+        # separate window, filled angle by angle while a sweep runs
+        self.accuracy_widget = AccuracyWidget()
+
     @Slot()
     def onLoadConfigurationClicked(self):
         base_dir = os.path.dirname(os.path.realpath(sys.argv[0]))
@@ -42,11 +49,16 @@ class AutomatedTestWidget(QWidget):
         try:
             file = open(fileName)
             self.config = yaml.load(file)
-            self.widget.pbStart.setEnabled(True)
             file.close()
             self.logger.info(self.config)
+            # max_samples is the sweep's, not the stopping rule's
+            sequential_stop(self.config.get('adaptive'), ('max_samples',))
+            self.widget.pbStart.setEnabled(True)
         except IOError as ioe:
             self.logger.error(ioe)
+        except ValueError as e:
+            self.logger.error(e)
+            QMessageBox.critical(self, 'Error', str(e), QMessageBox.Ok)
 
     @Slot()
     def onStartClicked(self):
@@ -55,12 +67,17 @@ class AutomatedTestWidget(QWidget):
             return
         self.widget.pbStart.setEnabled(False)
         self.widget.pbLoadConfiguration.setEnabled(False)
-        self.thread = TestThread(self.config, self.acs_control_widget, self.recorder_widget, self)
+        self.thread = TestThread(self.config, self.broadcaster, self.acs_control_widget, self.recorder_widget, self)
         self.broadcaster.recordingStopped.connect(self.thread.wake)
         self.recorder_widget.recordingStarted.connect(self.thread.recordingStarted)
-        self.thread.startRecording.connect(self.recorder_widget.onRecordClicked)
+        self.thread.startRecording.connect(self.recorder_widget.recordForSweep)
         self.thread.updateProgress.connect(self.widget.prbProgress.setValue)
         self.thread.testFinished.connect(self.enableLoadButton)
+        self.thread.angleEvaluated.connect(self.accuracy_widget.addResult)
+        self.thread.testFinished.connect(self.accuracy_widget.sweepFinished)
+        self.accuracy_widget.abortClicked.connect(self.thread.abort)
+        self.accuracy_widget.clear()
+        self.accuracy_widget.show()
         self.thread.start()
 
     @Slot()
@@ -74,15 +91,19 @@ class TestThread(QThread):
     startRecording = Signal()
     updateProgress = Signal(int)
     testFinished = Signal()
+    angleEvaluated = Signal(object)
     logger = logging.getLogger('aruco_analyzer.gui.AutomatedTestWidget')
 
-    def __init__(self, config, acs_control_widget, recorder_widget, parent=None):
+    def __init__(self, config, broadcaster, acs_control_widget, recorder_widget, parent=None):
         QThread.__init__(self, parent)
         self.config = config
+        self.broadcaster = broadcaster
         self.acs_control_widget = acs_control_widget
         self.recorder_widget = recorder_widget
         self.recordingStopped = Event()
         self.recordingStartedEvent = Event()
+        self.aborted = Event()
+        self.monitor = AccuracyMonitor()
 
     @Slot()
     def wake(self):
@@ -92,6 +113,32 @@ class TestThread(QThread):
     def recordingStarted(self):
         self.recordingStartedEvent.set()
 
+    @Slot()
+    def abort(self):
+        # the current recording is dropped, the table returns to 0
+        if self.isRunning():
+            self.aborted.set()
+            self.broadcaster.stopRecording()
+
+    def evaluate(self, angle, stats, abort_error):
+        if stats.count == 0:
+            return
+        result = self.monitor.add(angle, stats.quaternion, stats.attitude_std)
+        self.angleEvaluated.emit(result)
+        if abort_error is not None and abs(result.error) > abort_error:
+            self.logger.error('error {:.3f} at angle {} exceeds {}, aborting'.format(result.error, angle, abort_error))
+            self.aborted.set()
+
+    def waitForRest(self, max_wait):
+        # False if the turntable did not reach its target, both waits end early on abort
+        if not self.acs_control_widget.controller.wait_settled(cancel=self.aborted):
+            return False
+        # the drive reaching its target does not mean the object stopped swinging
+        self.broadcaster.settle.reset()
+        if not self.broadcaster.settle.wait(max_wait, self.aborted) and not self.aborted.is_set():
+            self.logger.warning('not at rest after {}s, recording anyway'.format(max_wait))
+        return True
+
     def run(self):
         self.logger.info('starting...')
         base_dir = os.path.dirname(os.path.realpath(sys.argv[0]))
@@ -107,10 +154,23 @@ class TestThread(QThread):
         step = self.config['step']
         angles = range(start, end+step, step)
 
+        settle = self.config.get('settle', {})
+        self.broadcaster.settle.configure(settle.get('window'), settle.get('rotation_rate'), settle.get('position_std'))
+        max_wait = settle.get('max_wait', 10.)
+
+        # with `adaptive`, its max_samples replaces samples as the maximum per angle
+        adaptive = self.config.get('adaptive') or {}
+        samples = adaptive.get('max_samples', samples)
+        self.broadcaster.set_stopping_rule(sequential_stop(adaptive, ('max_samples',)))
+
         self.recorder_widget.setSamples(samples)
         self.recorder_widget.setTimeout(timeout)
 
+        abort_error = self.config.get('abort_error')
+
         self.acs_control_widget.onOpenPortClicked()
+        # recordings are written while the turntable moves on
+        writer = SweepWriter(self.config.get('write_queue', 4), summary=os.path.join(series_dir, 'summary.csv'))
 
         for i, angle in enumerate(angles):
             self.logger.info('angle {}'.format(angle))
@@ -118,17 +178,31 @@ class TestThread(QThread):
             fileName = os.path.join(series_dir, str(angle))
             self.acs_control_widget.setTargetAngle(angle)
             self.acs_control_widget.onSetTargetAngleClicked()
-            time.sleep(1)
+            settled = self.waitForRest(max_wait)
+            if self.aborted.is_set():
+                break
+            if not settled:
+                self.logger.error('turntable did not reach {}, skipping the angle'.format(angle))
+                self.updateProgress.emit(99*(i+1)/len(angles))
+                continue
             self.startRecording.emit()
             if self.recordingStartedEvent.wait(1):
                 self.recordingStopped.clear()
                 self.logger.info('wait for recording to stop')
                 self.recordingStopped.wait()
                 self.recordingStartedEvent.clear()
+                if self.aborted.is_set():
+                    break
                 self.logger.info('saving data to {}'.format(fileName))
-                self.recorder_widget.saveToFile(fileName)
+                stats = self.broadcaster.summary()
+                writer.save(fileName, self.broadcaster.takeRecording(), stats)
+                self.evaluate(angle, stats, abort_error)
+                if self.aborted.is_set():
+                    break
             else:
                 self.logger.info('timeout')
+                writer.close()
+                self.broadcaster.set_stopping_rule(None)
                 self.testFinished.emit()
                 return
 
@@ -137,7 +211,10 @@ class TestThread(QThread):
 
         self.acs_control_widget.setTargetAngle(0)
         self.acs_control_widget.onSetTargetAngleClicked()
-        time.sleep(10)
+        if not self.acs_control_widget.controller.wait_settled():
+            self.logger.error('turntable did not return to 0')
+        writer.close()
+        self.broadcaster.set_stopping_rule(None)
         self.logger.info('thread end')
         self.updateProgress.emit(100)
         self.testFinished.emit()
\ No newline at end of file
@@ -0,0 +1,28 @@
+from __future__ import division
+
+from PySide2.QtCore import QObject, QTimer, Signal, Slot
+
+class DisplayThrottle(QObject):
+    refresh = Signal(object)
+
+    def __init__(self, rate, parent=None):
+        super(DisplayThrottle, self).__init__(parent)
+
+        self.latest = None
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / rate))
+        self.timer.timeout.connect(self.flush)
+        self.timer.start()
+
+    @Slot(object)
+    def push(self, snapshot):
+        # only the newest snapshot survives until the next refresh
+        self.latest = snapshot
+
+    @Slot()
+    def flush(self):
+        if self.latest is None:
+            return
+        snapshot, self.latest = self.latest, None
+        self.refresh.emit(snapshot)
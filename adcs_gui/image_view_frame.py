@@ -3,44 +3,102 @@ from __future__ import division
 import os
 import sys
 import time
-from threading import Lock
 from PySide2.QtWidgets import QFrame
-from PySide2.QtCore import Qt, Slot, QFile
+from PySide2.QtCore import Qt, Signal, Slot, QFile, QTimer
 from PySide2.QtUiTools import QUiLoader
-from PySide2.QtGui import QImage, QPixmap, QPainter
+from PySide2.QtGui import QImage, QPixmap, QPainter, QGuiApplication
 
 import cv2
+import numpy as np
+
+from core.latency import monotonic
+
+# Qt >= 5.14 can take OpenCV's BGR frames without a color conversion
+BGR_FORMAT = getattr(QImage, 'Format_BGR888', None)
 
 class ImageViewFrame(QFrame):
+    painted = Signal(object)
+    frameAvailable = Signal()
 
-    def __init__(self, image, parent=None):
+    def __init__(self, mailbox, parent=None):
         super(ImageViewFrame, self).__init__(parent)
 
-        self.image = image
+        self.mailbox = mailbox
+        self.generation = 0
         self.qimage = None
-        self.lock = Lock()
+        # self.buffer keeps the memory behind self.qimage alive, the scaled and
+        # converted buffers are reused between frames
+        self.buffer = None
+        self.scaled = None
+        self.converted = None
+        self.source_size = None
+        self.trace = None
+
+        # paint at most once per monitor refresh
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None else 0
+        self.min_interval = 1. / (refresh_rate if refresh_rate > 0 else 60.)
+        self.last_paint = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.displayImage)
+
+        # the mailbox wakes the frame up from the producer thread via a queued signal
+        self.frameAvailable.connect(self.displayImage)
+        self.mailbox.notify = self.frameAvailable.emit
 
     @Slot()
     def displayImage(self):
-        if self.lock.acquire(False):
-            if self.image[0] is not None:
-                image = self.image[0].copy()
-                cv2.cvtColor(image, cv2.COLOR_BGR2RGB, image)
-                height, width, _ = image.shape
-                self.qimage = QImage(image, width, height, image.strides[0], QImage.Format_RGB888)
-                self.resizeAspectRatio(self.contentsRect().size())
-                
-            self.lock.release()
-            self.update()
-            self.repaint()
-        else:
-            print('image_view_widget: acquiring lock failed')
+        wait = self.min_interval - (monotonic() - self.last_paint)
+        if wait > 0:
+            if not self.timer.isActive():
+                self.timer.start(int(wait * 1000) + 1)
+            return
+
+        self.generation, item = self.mailbox.take(self.generation)
+        if item is None:
+            return
+        image, trace = item
+        if trace is not None:
+            trace.mark('deliver')
+            self.trace = trace
+        if image is not None:
+            self.setImage(image)
         self.update()
 
+    def setImage(self, image):
+        height, width, _ = image.shape
+        if self.source_size != (width, height):
+            self.source_size = (width, height)
+            self.resizeAspectRatio(self.contentsRect().size())
+
+        # downsample once to the displayed size instead of on every paint
+        size = self.contentsRect().size() * self.devicePixelRatioF()
+        scale = min(size.width() / width, size.height() / height)
+        if 0 < scale < 1:
+            dsize = (max(int(width * scale), 1), max(int(height * scale), 1))
+            if self.scaled is None or self.scaled.shape[1::-1] != dsize:
+                self.scaled = np.empty((dsize[1], dsize[0], 3), dtype=np.uint8)
+            cv2.resize(image, dsize, dst=self.scaled, interpolation=cv2.INTER_AREA)
+            if BGR_FORMAT is None:
+                cv2.cvtColor(self.scaled, cv2.COLOR_BGR2RGB, self.scaled)
+            buffer = self.scaled
+        elif BGR_FORMAT is not None:
+            buffer = image
+        else:
+            if self.converted is None or self.converted.shape != image.shape:
+                self.converted = np.empty_like(image)
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, self.converted)
+            buffer = self.converted
+
+        height, width, _ = buffer.shape
+        image_format = QImage.Format_RGB888 if BGR_FORMAT is None else BGR_FORMAT
+        self.buffer = buffer
+        self.qimage = QImage(buffer.data, width, height, buffer.strides[0], image_format)
+
     def resizeAspectRatio(self, size):
         try:
-            width = self.qimage.size().width()
-            height = self.qimage.size().height()
+            width, height = self.source_size
             ratio = height / width
             if self.contentsRect().size().height() / self.contentsRect().size().width() > ratio:
                 event_width = size.width()
@@ -52,9 +110,21 @@ class ImageViewFrame(QFrame):
             pass
 
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.drawImage(self.contentsRect(), self.qimage)
+        self.last_paint = monotonic()
+        if self.qimage is not None:
+            painter = QPainter(self)
+            painter.drawImage(self.contentsRect(), self.qimage)
+            if self.mailbox.skipped > 0:
+                painter.setPen(Qt.yellow)
+                rect = self.contentsRect()
+                painter.drawText(rect.left() + 4, rect.top() + 4 + painter.fontMetrics().ascent(),
+                                 '{} frames skipped'.format(self.mailbox.skipped))
+            painter.end()
+        if self.trace is not None:
+            trace, self.trace = self.trace, None
+            trace.mark('paint')
+            self.painted.emit(trace)
 
     def resizeEvent(self, event):
-        if self.qimage is not None:
+        if self.source_size is not None:
             self.resizeAspectRatio(event.size())
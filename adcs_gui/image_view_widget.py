@@ -1,13 +1,14 @@
 import os
 from PySide2.QtWidgets import QWidget, QSizePolicy
-from PySide2.QtCore import Qt, Slot, QFile
+from PySide2.QtCore import Qt, Signal, Slot, QFile
 from PySide2.QtUiTools import QUiLoader
 
 from .image_view_frame import ImageViewFrame
 
 class ImageViewWidget(QWidget):
+    painted = Signal(object)
 
-    def __init__(self, image, parent=None):
+    def __init__(self, mailbox, parent=None):
         super(ImageViewWidget, self).__init__(parent)
 
         base_dir = os.path.dirname(os.path.realpath(__file__))
@@ -18,17 +19,14 @@ class ImageViewWidget(QWidget):
         self.widget = loader.load(file, self)
         file.close()
 
-        self.ivf = ImageViewFrame(image, self)
+        self.ivf = ImageViewFrame(mailbox, self)
         self.widget.layout().addWidget(self.ivf)
+        self.ivf.painted.connect(self.painted)
 
-        self.image = image
+        self.mailbox = mailbox
 
         self.setMinimumSize(640, 360),
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
-    @Slot()
-    def displayImage(self):
-        self.ivf.displayImage()
-
     def resizeEvent(self, event):
         self.widget.resize(event.size())
@@ -0,0 +1,71 @@
+import os
+import numpy as np
+from PySide2.QtWidgets import QWidget, QTableWidgetItem, QHeaderView
+from PySide2.QtCore import Slot, QFile, QTimer
+from PySide2.QtUiTools import QUiLoader
+
+from core.latency import COLUMNS, PERCENTILES
+
+class LatencyWidget(QWidget):
+
+    def __init__(self, monitor, parent=None):
+        super(LatencyWidget, self).__init__(parent)
+
+        base_dir = os.path.dirname(os.path.realpath(__file__))
+        form_dir = os.path.join(base_dir, 'forms', 'latency_widget.ui')
+        file = QFile(form_dir)
+        file.open(QFile.ReadOnly)
+        loader = QUiLoader()
+        self.widget = loader.load(file, self)
+        file.close()
+
+        self.monitor = monitor
+
+        table = self.widget.twLatency
+        table.setRowCount(len(COLUMNS))
+        table.setColumnCount(len(PERCENTILES))
+        table.setVerticalHeaderLabels(list(COLUMNS))
+        table.setHorizontalHeaderLabels(['p{}'.format(p) for p in PERCENTILES])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        for row in range(len(COLUMNS)):
+            for column in range(len(PERCENTILES)):
+                table.setItem(row, column, QTableWidgetItem(''))
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+
+        self.widget.gbLatency.toggled.connect(self.setExpanded)
+        self.setExpanded(False)
+
+    @Slot()
+    def setExpanded(self, expanded):
+        self.widget.cbObject.setVisible(expanded)
+        self.widget.twLatency.setVisible(expanded)
+        if expanded:
+            self.setMinimumSize(460, 250)
+            self.setMaximumSize(16777215, 250)
+            self.timer.start()
+            self.refresh()
+        else:
+            self.setMinimumSize(460, 50)
+            self.setMaximumSize(16777215, 50)
+            self.timer.stop()
+
+    @Slot()
+    def refresh(self):
+        for id in self.monitor.ids():
+            if self.widget.cbObject.findText(id) == -1:
+                self.widget.cbObject.addItem(id)
+
+        percentiles = self.monitor.percentiles(self.widget.cbObject.currentText())
+        if percentiles is None:
+            return
+        for row in range(len(COLUMNS)):
+            for column in range(len(PERCENTILES)):
+                value = percentiles[row, column]
+                text = '' if np.isnan(value) else '{:.1f}ms'.format(value * 1000)
+                self.widget.twLatency.item(row, column).setText(text)
+
+    def resizeEvent(self, event):
+        self.widget.resize(event.size())
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import math
+import numpy as np
+from PySide2.QtCore import Qt, Slot, QAbstractTableModel
+
+from core import pose
+
+class PoseTableModel(QAbstractTableModel):
+
+    def __init__(self, table, rate_stats, parent=None):
+        super(PoseTableModel, self).__init__(parent)
+        self.table = table
+        # snapshot of {id: RateStats}, taken under the broadcaster's lock
+        self.rate_stats = rate_stats
+        self.version = -1
+        self.ids = []
+        self.distances = np.zeros((0, 0))
+        self.angles = np.zeros((0, 0))
+        self.positions = np.zeros((0, 0, 3))
+        self.eulers = np.zeros((0, 0, 3))
+
+    def rowCount(self, parent=None):
+        return len(self.ids)
+
+    def columnCount(self, parent=None):
+        return len(self.ids)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if section >= len(self.ids):
+            return None
+        id = self.ids[section]
+        if role == Qt.DisplayRole:
+            return id
+        if role == Qt.ToolTipRole:
+            stats = self.rate_stats().get(id)
+            if stats is not None:
+                return '{}: {:.2f}Hz (max gap {:.1f}ms, {} dropouts)'.format(
+                    id, stats.ewma, stats.max_gap * 1000, stats.dropouts)
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        row, column = index.row(), index.column()
+        if row == column or np.isnan(self.distances[row, column]):
+            return None
+        if role == Qt.DisplayRole:
+            return u'{:.2f}cm {:.2f}°'.format(self.distances[row, column] * 100, self.angles[row, column])
+        if role == Qt.ToolTipRole:
+            pos = self.positions[row, column] * 100
+            ori = self.eulers[row, column]
+            return u'{} relative to {}\nx: {:.3f}cm y: {:.3f}cm z: {:.3f}cm\nyaw: {:.3f}° pitch: {:.3f}° roll: {:.3f}°'.format(
+                self.ids[column], self.ids[row], pos[0], pos[1], pos[2], ori[0], ori[1], ori[2])
+        return None
+
+    @Slot()
+    def refresh(self):
+        if self.table.version == self.version:
+            return
+        version, ids, positions, quaternions = self.table.snapshot()
+        resized = len(ids) != len(self.ids)
+        if resized:
+            self.beginResetModel()
+
+        self.version = version
+        self.ids = ids
+        self.positions = positions
+        self.distances = np.linalg.norm(positions, axis=-1)
+        self.angles = np.degrees(pose.angle(quaternions)) if len(ids) > 0 else np.zeros((0, 0))
+        self.eulers = np.degrees(pose.to_euler(quaternions)) if len(ids) > 0 else np.zeros((0, 0, 3))
+
+        if resized:
+            self.endResetModel()
+        elif len(ids) > 0:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(ids) - 1, len(ids) - 1))
@@ -0,0 +1,36 @@
+from __future__ import division
+
+import os
+from PySide2.QtWidgets import QWidget, QHeaderView
+from PySide2.QtCore import QFile, QTimer
+from PySide2.QtUiTools import QUiLoader
+
+from .pose_table_model import PoseTableModel
+
+class PoseTableWidget(QWidget):
+
+    def __init__(self, table, rate_stats, display_rate, parent=None):
+        super(PoseTableWidget, self).__init__(parent)
+
+        base_dir = os.path.dirname(os.path.realpath(__file__))
+        form_dir = os.path.join(base_dir, 'forms', 'pose_table_widget.ui')
+        file = QFile(form_dir)
+        file.open(QFile.ReadOnly)
+        loader = QUiLoader()
+        self.widget = loader.load(file, self)
+        file.close()
+
+        self.setMinimumSize(460, 180)
+
+        self.model = PoseTableModel(table, rate_stats, self)
+        self.widget.tvPoses.setModel(self.model)
+        self.widget.tvPoses.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        # the table is refreshed in bulk, independent of the detection rate
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / display_rate))
+        self.timer.timeout.connect(self.model.refresh)
+        self.timer.start()
+
+    def resizeEvent(self, event):
+        self.widget.resize(event.size())
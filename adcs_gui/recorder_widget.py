@@ -1,11 +1,16 @@
+# -*- coding: utf-8 -*-
 import os
 import sys
 import time
+import numpy as np
 from PySide2.QtWidgets import QWidget, QFileDialog, QMessageBox
-from PySide2.QtCore import Qt, Signal, Slot, QFile
+from PySide2.QtCore import Qt, Signal, Slot, QFile, QTimer
 from PySide2.QtUiTools import QUiLoader
 from PySide2.QtGui import QIntValidator
 
+from core import pose
+from core.sweep_writer import append_summary
+
 class RecorderWidget(QWidget):
     recordingStarted = Signal()
 
@@ -20,8 +25,8 @@ class RecorderWidget(QWidget):
         self.widget = loader.load(file, self)
         file.close()
 
-        self.setMinimumSize(300, 220)
-        self.setMaximumSize(16777215, 220)
+        self.setMinimumSize(300, 270)
+        self.setMaximumSize(16777215, 270)
         
         self.broadcaster = broadcaster
 
@@ -30,40 +35,96 @@ class RecorderWidget(QWidget):
         self.broadcaster.recordingStopped.connect(self.enableRecordButton)
         self.broadcaster.recordingProgress.connect(self.updateRecordProgress)
 
+        # the running statistics change with every sample, a few updates per second are enough
+        self.statsTimer = QTimer(self)
+        self.statsTimer.setInterval(200)
+        self.statsTimer.timeout.connect(self.updateStats)
+        self.broadcaster.recordingStopped.connect(self.statsTimer.stop)
+        self.broadcaster.recordingStopped.connect(self.updateStats)
+
     def resizeEvent(self, event):
         self.widget.resize(event.size())
 
     @Slot()
     def onRecordClicked(self):
+        if self.broadcaster.record:
+            self.broadcaster.stopRecording()
+            return
+        self.startRecording(self.widget.cbStream.isChecked())
+
+    @Slot()
+    def recordForSweep(self):
+        # sweeps take every recording from memory and save it themselves,
+        # so they never stream, whatever the check box says
+        if self.broadcaster.record:
+            self.broadcaster.stopRecording()
+        self.startRecording(False)
+
+    def startRecording(self, streaming):
         samples = self.widget.sbSamples.value()
         timeout = self.widget.sbTimeout.value() * 1000
-        if self.broadcaster.startRecording(samples, timeout):
-            self.widget.pbRecord.setEnabled(False)
-            self.widget.pbRecord.setText('Recording...')
+        fileName = None
+        if streaming:
+            fileName = self.getSaveFileName(streaming=True)
+            if fileName == '':
+                return
+            samples = 0
+
+        if self.broadcaster.startRecording(samples, timeout, fileName):
+            if streaming:
+                self.widget.pbRecord.setText('Stop')
+            else:
+                self.widget.pbRecord.setEnabled(False)
+                self.widget.pbRecord.setText('Recording...')
+            self.widget.cbStream.setEnabled(False)
+            self.statsTimer.start()
             self.recordingStarted.emit()
         else:
             QMessageBox.critical(self, 'Error', 'No object selected for tracking!', QMessageBox.Ok)
 
     @Slot()
     def onSaveToFileClicked(self):
+        self.saveToFile(self.getSaveFileName())
+
+    def getSaveFileName(self, streaming=False):
         base_dir = sys.path[0]
         out_path = os.path.join(base_dir, 'out')
         if not os.path.exists(out_path):
             os.mkdir(out_path)
         fileName = os.path.join(out_path, 'out.csv')
-        fileName, _ = QFileDialog.getSaveFileName(self, 'Save data', fileName, 'csv (*.csv)')
-        self.saveToFile(fileName)
+        # streamed samples are written as CSV lines, binary files only at the end
+        filters = 'csv (*.csv)' if streaming else 'csv (*.csv);;npy (*.npy)'
+        fileName, _ = QFileDialog.getSaveFileName(self, 'Save data', fileName, filters)
+        return fileName
 
     def saveToFile(self, fileName):
         if fileName != '':
-            self.broadcaster.saveToFile(fileName)
+            stats = self.broadcaster.summary()._replace(fileName=fileName)
+            if self.broadcaster.saveToFile(fileName):
+                # recordings saved into the same directory share a summary
+                append_summary(os.path.join(os.path.dirname(fileName), 'summary.csv'), stats)
             self.widget.pbSaveToFile.setEnabled(False)
 
+    @Slot()
+    def updateStats(self):
+        stats = self.broadcaster.summary()
+        if stats.count == 0:
+            self.widget.lPositionStats.setText('-')
+            self.widget.lAttitudeStats.setText('-')
+            return
+        self.widget.lPositionStats.setText(' '.join('{:.4f}±{:.4f}'.format(m, s) for m, s in
+                                                    zip(stats.position, stats.position_std)))
+        euler = np.degrees(pose.to_euler(stats.quaternion))
+        self.widget.lAttitudeStats.setText('{:.2f} {:.2f} {:.2f} ±{:.3f}°'.format(
+            euler[0], euler[1], euler[2], stats.attitude_std))
+
     @Slot()
     def enableRecordButton(self):
         self.widget.pbRecord.setEnabled(True)
         self.widget.pbRecord.setText('Record')
-        self.widget.pbSaveToFile.setEnabled(True)
+        self.widget.cbStream.setEnabled(True)
+        # streamed recordings are already on disk
+        self.widget.pbSaveToFile.setEnabled(not self.widget.cbStream.isChecked())
 
     @Slot()
     def updateRecordProgress(self, samples, max_samples):
@@ -1,12 +1,15 @@
 #!/usr/bin/env python
 import os
+import sys
 import math
 import yaml
 import re
 import numpy as np
-import pyquaternion as pq
 from scipy.spatial.transform import Rotation as R
 from quaternion_helper import averageQuaternions, quaternion_distance
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+from core.recording_format import load, list_recordings
+from core import pose
 from natsort import natsorted
 import matplotlib.pyplot as plt
 
@@ -27,7 +30,7 @@ def plot_position():
     # pattern = re.compile('[0-9]+_[0-9]+.csv')
     pattern = re.compile('3+_[0-9]+.csv')
     # pattern = re.compile('[0-9]+_7+.csv')
-    data_files = natsorted(os.listdir(test_path))
+    data_files = natsorted(list_recordings(test_path))
     data_files = list(filter(lambda s: pattern.match(s), data_files))
 
     x_axis = []
@@ -41,21 +44,20 @@ def plot_position():
 
         x_axis.append(expected[2]*100)
 
-        with open(file) as csv_file:
-            raw_data = np.genfromtxt(csv_file, delimiter=',')
-            average_position = np.array([np.average(raw_data[:,1]), np.average(raw_data[:,2]), np.average(raw_data[:,3])])
-            average_quat = pq.Quaternion(averageQuaternions(raw_data[:,4:])).normalised
-            # rot = average_quat.yaw_pitch_roll
-            # r = R.from_rotvec([-24/180.*np.pi,0,0])
-            # average_position = r.apply(average_position)
-            # rotate position
-            # average_position = transform(average_position, average_quat.inverse)
+        raw_data = load(file)
+        average_position = np.array([np.average(raw_data['position'][:,0]), np.average(raw_data['position'][:,1]), np.average(raw_data['position'][:,2])])
+        average_quat = pose.normalize(averageQuaternions(raw_data['quaternion']))
+        # rot = average_quat.yaw_pitch_roll
+        # r = R.from_rotvec([-24/180.*np.pi,0,0])
+        # average_position = r.apply(average_position)
+        # rotate position
+        # average_position = pose.rotate(pose.inverse(average_quat), average_position)
 
-            error = average_position-expected
-            data.append(error*100)
-            print(average_position)
-            # print(error)
-            # print(np.array([np.std(raw_data[:,1]), np.std(raw_data[:,2]), np.std(raw_data[:,3])])*100)
+        error = average_position-expected
+        data.append(error*100)
+        print(average_position)
+        # print(error)
+        # print(np.array([np.std(raw_data['position'][:,0]), np.std(raw_data['position'][:,1]), np.std(raw_data['position'][:,2])])*100)
 
 
 
@@ -75,13 +77,6 @@ def plot_position():
 
     plt.show()
 
-def transform(position, q):
-    position_ = np.zeros((4))
-    position_[1:] = position
-    position = q * position_ * q.inverse
-
-    return position.elements[1:]
-
 def plot():
     test = '2'
     series = [
@@ -113,7 +108,7 @@ def plot():
     plt.show()
 
 def plot_single(series_path, ax):
-    angles = natsorted(os.listdir(series_path))
+    angles = natsorted(list_recordings(series_path))
     angles = list(map(int,filter(lambda s: s.isdigit(), angles)))
 
     ax.set_xticks(np.arange(0, 360+1, 45))
@@ -131,48 +126,47 @@ def plot_single(series_path, ax):
     for angle in angles:
         file = os.path.join(series_path, str(angle))
 
-        with open(file) as csv_file:
-            data = np.genfromtxt(csv_file, delimiter=',')
-            average_quat = pq.Quaternion(averageQuaternions(data[:,4:]))
-
-            if reference_quat is None:
-                previous_quat = average_quat
-                reference_quat = average_quat
-
-            # calculate camera angle
-            camera_angle_ = clip_angle(math.degrees(average_quat.yaw_pitch_roll[2])+90)
-            camera_angle.append(camera_angle_)
-
-            ## difference between two consecutive attitudes
-            if previous_quat is average_quat:
-                results_per_axis.append((0,0,-2))
-                results.append(0)
-            else:
-                delta_quat = previous_quat.inverse * average_quat
-                euler = map(math.degrees, delta_quat.yaw_pitch_roll)
-                results_per_axis.append((euler[2], euler[1], euler[0]))
-                results.append(abs(delta_quat.degrees)-2)
-                previous_quat = average_quat
-
-            ## error between calculated attitude and estimated attitude
-            ## not reliable since dependent on accuracy of reference_quat
-            # delta_angle = pq.Quaternion(axis=(0,0,1), degrees=-angle)
-            # desired_quat = reference_quat * delta_angle
-            # error = abs((desired_quat.inverse * average_quat).degrees)
-            # results.append(error)  
+        data = load(file)
+        average_quat = pose.normalize(averageQuaternions(data['quaternion']))
+
+        if reference_quat is None:
+            previous_quat = average_quat
+            reference_quat = average_quat
+
+        # calculate camera angle
+        camera_angle_ = clip_angle(math.degrees(pose.to_euler(average_quat)[2])+90)
+        camera_angle.append(camera_angle_)
+
+        ## difference between two consecutive attitudes
+        if previous_quat is average_quat:
+            results_per_axis.append((0,0,-2))
+            results.append(0)
+        else:
+            delta_quat = pose.multiply(pose.inverse(previous_quat), average_quat)
+            euler = np.degrees(pose.to_euler(delta_quat))
+            results_per_axis.append((euler[2], euler[1], euler[0]))
+            results.append(abs(math.degrees(pose.angle(delta_quat)))-2)
+            previous_quat = average_quat
+
+        ## error between calculated attitude and estimated attitude
+        ## not reliable since dependent on accuracy of reference_quat
+        # delta_angle = pq.Quaternion(axis=(0,0,1), degrees=-angle)
+        # desired_quat = reference_quat * delta_angle
+        # error = abs((desired_quat.inverse * average_quat).degrees)
+        # results.append(error)  
                   
-            ## not reliable since dependent on accuracy of reference_quat
-            # corrected_quat = reference_quat.inverse * average_quat
-            # euler = map(math.degrees, corrected_quat.yaw_pitch_roll)
-            # results_per_axis.append((euler[2], euler[1], (clip_angle(180-angle-euler[0]))))
-
-            # error between reference attitude and estimated attitude
-            distance = abs((reference_quat.inverse * average_quat).degrees)
-            if angle<180:
-                error = angle - distance
-            else:
-                error = angle - 360 + distance
-            results2.append(abs(error))
+        ## not reliable since dependent on accuracy of reference_quat
+        # corrected_quat = reference_quat.inverse * average_quat
+        # euler = map(math.degrees, corrected_quat.yaw_pitch_roll)
+        # results_per_axis.append((euler[2], euler[1], (clip_angle(180-angle-euler[0]))))
+
+        # error between reference attitude and estimated attitude
+        distance = math.degrees(pose.distance(reference_quat, average_quat))
+        if angle<180:
+            error = angle - distance
+        else:
+            error = angle - 360 + distance
+        results2.append(abs(error))
 
     camera_angle = np.average(camera_angle)
 
@@ -1,6 +1,9 @@
+# -*- coding: utf-8 -*-
 import os
 import sys
 import time
+import math
+import numpy as np
 from PySide2.QtWidgets import QWidget
 from PySide2.QtCore import Qt, Slot, QFile
 from PySide2.QtUiTools import QUiLoader
@@ -37,18 +40,45 @@ class TrackerWidget(QWidget):
         self.widget.leReferenceAge.setText('')
         self.widget.leReferenceRate.setText('')
 
+    @Slot(object)
+    def set_pose(self, snapshot):
+        pos = snapshot.position * 100
+        ori = list(map(math.degrees, snapshot.euler))
+
+        self.widget.leX.setText('{: 5.3f}cm'.format(pos[0]))
+        self.widget.leY.setText('{: 5.3f}cm'.format(pos[1]))
+        self.widget.leZ.setText('{: 5.3f}cm'.format(pos[2]))
+        self.widget.leRoll.setText(u'{: 5.3f}°'.format(ori[0]))
+        self.widget.lePitch.setText(u'{: 5.3f}°'.format(ori[1]))
+        self.widget.leYaw.setText(u'{: 5.3f}°'.format(ori[2]))
+        self.widget.leDistance.setText('{: 5.3f}cm'.format(np.linalg.norm(pos)))
+
+        now = time.time()
+        self.set_age(now - snapshot.timestamp)
+        self.set_rate(snapshot.rate)
+        if snapshot.reference_timestamp is None:
+            self.set_reference_age(-1)
+        else:
+            self.set_reference_age(now - snapshot.reference_timestamp)
+        self.set_reference_rate(snapshot.reference_rate)
+
+    def format_rate(self, line_edit, stats):
+        if stats is None:
+            line_edit.setText('')
+            line_edit.setToolTip('')
+        else:
+            line_edit.setText('{: 5.3f}Hz'.format(stats.ewma))
+            line_edit.setToolTip('window: {:.3f}Hz\ninstantaneous: {:.3f}Hz\ngap: {:.1f}ms - {:.1f}ms\ndropouts: {}'.format(
+                stats.rate, stats.instantaneous, stats.min_gap * 1000, stats.max_gap * 1000, stats.dropouts))
+
     @Slot()
-    def set_rate(self, rate):
-        self.widget.leRate.setText('{: 5.3f}Hz'.format(rate))
+    def set_rate(self, stats):
+        self.format_rate(self.widget.leRate, stats)
 
     @Slot()
-    def set_reference_rate(self, rate):
-        if rate == -1:
-            self.widget.leReferenceRate.setEnabled(False)
-            self.widget.leReferenceRate.setText('')
-        else:
-            self.widget.leReferenceRate.setEnabled(True)
-            self.widget.leReferenceRate.setText('{: 5.3f}Hz'.format(rate))
+    def set_reference_rate(self, stats):
+        self.widget.leReferenceRate.setEnabled(stats is not None)
+        self.format_rate(self.widget.leReferenceRate, stats)
 
     @Slot()
     def set_age(self, age):
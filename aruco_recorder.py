@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import logging
+import os
+import sys
+import threading
+from yaml import load
+try:
+    from yaml import CLoader as Loader
+except ImportError:
+    from yaml import Loader
+
+from aruco_analyzer import ARMarkerDetector, OpenCVImageMiner
+
+from core.pose_broadcaster import PoseBroadcaster
+from core import recording_format
+from core.video_source import image_miner_for
+
+# Headless recorder: runs the detector without Qt and records the tracked
+# object relative to the reference into a file.
+#
+#   python aruco_recorder.py -t C000 -r B001 -n 1000 out/sweep.csv
+#   python aruco_recorder.py -t C000 -d 60 out/sweep.npy
+#   python aruco_recorder.py -t C000 -d 60 -s data/sweep.avi out/offline.csv
+
+# seconds the stream writer gets to flush the queued samples after stopping
+WRITER_TIMEOUT = 30
+
+def parse_args(argv=None):
+    base_dir = os.path.dirname(os.path.realpath(__file__))
+    parser = argparse.ArgumentParser(description='Record ArUco poses without the GUI.')
+    parser.add_argument('output', help='recording file, .npy is written as binary, everything else as CSV')
+    parser.add_argument('-t', '--tracked', required=True, help='id of the tracked object, e.g. C000')
+    parser.add_argument('-r', '--reference', default='Camera', help='id of the reference object (default: Camera)')
+    parser.add_argument('-n', '--samples', type=int, default=0, help='stop after this many samples (0: no limit)')
+    parser.add_argument('-d', '--duration', type=float, default=0, help='stop after this many seconds (0: no limit)')
+    parser.add_argument('-s', '--source', help='video file or image directory to read instead of the camera')
+    parser.add_argument('--fps', type=float, default=0, help='frame rate of --source (default: unthrottled)')
+    parser.add_argument('-c', '--config', default=os.path.join(base_dir, 'config', 'config.yaml'))
+    return parser.parse_args(argv)
+
+def record(args):
+    logger = logging.getLogger('aruco_analyzer.gui.recorder')
+    config = load(open(args.config), Loader=Loader)
+    gui_config = config.get('gui', {})
+
+    broadcaster = PoseBroadcaster(gui_config.get('queue_size', 256), gui_config.get('batch_size', 32),
+                                  gui_config.get('history_size', 64), gui_config.get('latency_trace'))
+    broadcaster.set_reference_object(args.reference)
+    broadcaster.set_desired_object(args.tracked)
+
+    stopped = threading.Event()
+    broadcaster.on_stopped = stopped.set
+
+    detector = ARMarkerDetector(config)
+    source_config = {'path': args.source, 'fps': args.fps} if args.source else gui_config.get('image_source')
+    miner = image_miner_for(OpenCVImageMiner, source_config, os.path.dirname(os.path.realpath(__file__)), config)
+    detector.set_image_miner(miner)
+    detector.launch_detection_workers()
+    detector.launch_analyzer(broadcaster)
+
+    # CSV is streamed to disk while recording, binary files are written at the end
+    stream = not recording_format.is_binary(args.output)
+    if not broadcaster.startRecording(args.samples, int(args.duration * 1000), args.output if stream else None):
+        broadcaster.close()
+        return 1
+    # kept to learn whether the stream made it to disk
+    writer = broadcaster.writer
+    logger.info('Recording {} relative to {} into {}'.format(args.tracked, args.reference, args.output))
+
+    try:
+        # wait with a timeout so that Ctrl-C is delivered
+        while not stopped.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        broadcaster.stopRecording()
+    finally:
+        broadcaster.close()
+
+    # frames read against detections of the tracked object, for benchmarks on a fixed dataset
+    for capture in getattr(miner, 'captures', []):
+        logger.info('{} frames read at {:.1f} fps'.format(capture.frames_read, capture.measured_fps()))
+        if hasattr(capture, 'save_ground_truth'):
+            capture.save_ground_truth()
+    stats = broadcaster.rate_stats().get(args.tracked)
+    if stats is not None:
+        logger.info('{} detected at {:.1f} Hz, {} dropped by the broadcaster'.format(args.tracked, stats.rate, broadcaster.dropped))
+
+    if stream:
+        if not writer.wait(WRITER_TIMEOUT):
+            logger.error('{} not written after {}s'.format(args.output, WRITER_TIMEOUT))
+            return 1
+        if writer.error is not None:
+            return 1
+    elif not broadcaster.saveToFile(args.output):
+        return 1
+    return 0 if broadcaster.sample_counter > 0 else 1
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s: %(message)s')
+    sys.exit(record(parse_args()))
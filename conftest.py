@@ -0,0 +1 @@
+# makes `core` importable for the tests in tests/
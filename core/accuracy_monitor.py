@@ -0,0 +1,51 @@
+import math
+from collections import namedtuple
+
+from core import pose
+from core.online_stats import OnlineStats
+
+# error: commanded turn since the first angle minus the measured one,
+# step_error: the same between consecutive angles, both in degrees
+AngleResult = namedtuple('AngleResult', ['angle', 'error', 'step_error', 'attitude_std',
+                                         'count', 'mean', 'std', 'max'])
+
+class AccuracyMonitor(object):
+    # Per-angle accuracy of a turntable sweep while it runs, with the error
+    # definitions of adcs_gui/tests/evaluate.py (plot_single): the averaged
+    # attitude of every angle is compared to the one of the first angle and
+    # to the one of the previous angle. Each new angle costs O(1), earlier
+    # recordings are never read again.
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.reference = None
+        self.first_angle = None
+        self.previous = None
+        self.errors = OnlineStats(1)
+        self.max_error = 0.
+
+    def add(self, angle, quaternion, attitude_std=None):
+        quaternion = pose.normalize(quaternion)
+        if self.reference is None:
+            self.reference = quaternion
+            self.first_angle = angle
+            self.previous = (angle, quaternion)
+            error = 0.
+            step_error = 0.
+        else:
+            turned = (angle - self.first_angle) % 360
+            distance = math.degrees(pose.distance(self.reference, quaternion))
+            # the distance is at most 180 degrees, past that the table comes back
+            error = turned - distance if turned < 180 else turned - 360 + distance
+            previous_angle, previous_quaternion = self.previous
+            step = abs(angle - previous_angle) % 360
+            step_error = math.degrees(pose.distance(previous_quaternion, quaternion)) - min(step, 360 - step)
+            self.previous = (angle, quaternion)
+
+        self.errors.add([abs(error)])
+        self.max_error = max(self.max_error, abs(error))
+        std = self.errors.std()[0] if self.errors.count > 1 else 0.
+        return AngleResult(angle, error, step_error, attitude_std, self.errors.count,
+                           self.errors.mean[0], std, self.max_error)
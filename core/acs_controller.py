@@ -0,0 +1,271 @@
+import re
+import time
+import logging
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import serial
+
+from core.latency import monotonic
+from core.virtual_acs import VirtualSerial, VIRTUAL_PORT, COUNTS_PER_DEGREE
+
+NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+# motion status (MS) of a drive at rest
+STOPPED = 0
+
+class Request(object):
+    # A command waiting for the I/O worker. `reply` is the answer line without
+    # the terminator, None if the drive did not answer in time.
+
+    def __init__(self, command, expect_reply):
+        self.command = command
+        self.expect_reply = expect_reply
+        self.reply = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        return self.reply
+
+    def value(self, timeout=None):
+        # number in a query answer, None if there was none
+        reply = self.wait(timeout)
+        if reply is None or '?' in reply:
+            return None
+        numbers = NUMBER.findall(reply)
+        return float(numbers[-1]) if numbers else None
+
+class ACSController(object):
+    # All serial I/O happens on one worker thread, callers only queue
+    # commands. Commands are written without reading anything back, only
+    # queries wait for an answer line. With `feedback` the worker polls the
+    # actual position (PX) and motion status (MS) between commands, so that
+    # moves can be waited for instead of slept over. That reply format is
+    # only known from the simulated drive of core/virtual_acs.py, so it is off
+    # by default except on the 'virtual' port. Without it, and for drives that
+    # stop answering, moves wait for the duration of the motion profile.
+
+    reply_timeout = 0.2
+    poll_interval = 0.05
+    max_missed = 5
+
+    def __init__(self, feedback=False):
+        self.logger = logging.getLogger('aruco_analyzer.gui.acs_controller')
+        self.serial_interface = self.make_serial()
+
+        self.requests = queue.Queue()
+        self.worker = None
+        self.running = threading.Event()
+        self.state_changed = threading.Condition()
+        self.position = None
+        self.status = None
+        self.ms_answered = False
+        self.position_feedback = feedback
+        self.feedback = False
+        self.missed = 0
+        self.target = None
+        self.speed = 100000
+        self.acceleration = 200000
+        self.move_started = None
+
+    def make_serial(self):
+        return serial.Serial(port=None, baudrate=19200, \
+            bytesize=serial.EIGHTBITS, parity=serial.PARITY_NONE, \
+            stopbits=serial.STOPBITS_ONE, timeout=self.reply_timeout, xonxoff=False, \
+            rtscts=True, write_timeout=1., \
+            dsrdtr=True, inter_byte_timeout=None)
+
+    def open_port(self, port):
+        self.close_port()
+        # the 'virtual' port is the simulated drive of core/virtual_acs.py
+        if port == VIRTUAL_PORT:
+            self.serial_interface = VirtualSerial(timeout=self.reply_timeout)
+        elif isinstance(self.serial_interface, VirtualSerial):
+            self.serial_interface = self.make_serial()
+        self.serial_interface.port = port
+        self.serial_interface.open()
+
+        # nothing learned from the previous port applies to this one
+        while not self.requests.empty():
+            request = self.requests.get_nowait()
+            if request is not None:
+                request.done.set()
+        with self.state_changed:
+            self.position = None
+            self.status = None
+            self.ms_answered = False
+            self.target = None
+            self.move_started = None
+        self.feedback = self.position_feedback or port == VIRTUAL_PORT
+        self.missed = 0
+        self.running.set()
+        self.worker = threading.Thread(target=self.run)
+        self.worker.daemon = True
+        self.worker.start()
+
+    def close_port(self):
+        if self.worker is not None:
+            self.running.clear()
+            self.requests.put(None)
+            self.worker.join()
+            self.worker = None
+        if self.serial_interface.is_open:
+            self.serial_interface.close()
+
+    def run(self):
+        last_poll = 0
+        while self.running.is_set():
+            try:
+                request = self.requests.get(timeout=self.poll_interval)
+            except queue.Empty:
+                request = None
+            if request is not None:
+                self.execute(request)
+            if self.feedback and monotonic() - last_poll >= self.poll_interval:
+                last_poll = monotonic()
+                self.poll()
+
+    def execute(self, request):
+        try:
+            if request.expect_reply:
+                # whatever the drive sent unasked must not be taken for the answer
+                self.serial_interface.reset_input_buffer()
+            self.serial_interface.write((request.command + '\r\n').encode('UTF-8'))
+            if request.expect_reply:
+                request.reply = self.read_decode_string().strip() or None
+        except serial.SerialException as e:
+            self.logger.error('{} failed: {}'.format(request.command, e))
+        request.done.set()
+
+    def poll(self):
+        position = self.execute_now('PX').value(0)
+        status = self.execute_now('MS').value(0)
+        if position is None and status is None:
+            self.missed += 1
+            if self.missed >= self.max_missed:
+                self.logger.warning('No position feedback, falling back to timed moves')
+                self.feedback = False
+            return
+        self.missed = 0
+        with self.state_changed:
+            self.position = position
+            self.status = status
+            if status is not None:
+                self.ms_answered = True
+            self.state_changed.notify_all()
+
+    def execute_now(self, command):
+        request = Request(command, True)
+        self.execute(request)
+        return request
+
+    def send(self, command, expect_reply=False):
+        request = Request(command, expect_reply)
+        if self.worker is None:
+            self.logger.warning('Port not open, {} not sent'.format(command))
+            request.done.set()
+        else:
+            self.requests.put(request)
+        return request
+
+    def query(self, command, timeout=1.):
+        return self.send(command, True).value(timeout)
+
+    def send_encode_string(self, data):
+        self.send(data)
+
+    def read_decode_string(self):
+        return self.serial_interface.readline().decode('UTF-8')
+
+    def motor_on(self):
+        self.send_encode_string('SH')
+
+    def motor_off(self):
+        self.send_encode_string('MO')
+
+    def stop_motor(self):
+        self.send_encode_string('ST')
+
+    def sp(self, speed):
+        number = int(speed)
+        number = number*10000
+        self.speed = number
+        self.send_encode_string('SP'+str(number))
+
+    def pa(self, degree):
+        number = int(degree)
+        number = number*10000
+        self.send_encode_string('PA'+str(number))
+        self.begin(number)
+
+    def begin(self, target):
+        previous = self.target if self.position is None else self.position
+        with self.state_changed:
+            self.target = target
+            self.move_started = (monotonic(), previous)
+            # the status from before BG must not count as settled
+            self.status = None
+        self.send_encode_string('BG')
+
+    def not_moving_fix(self):
+        self.send_encode_string('ST')
+        self.send_encode_string('SH')
+        self.send_encode_string('SP100000')
+
+    @property
+    def angle(self):
+        # last polled position in degrees, None without feedback
+        position = self.position
+        return None if position is None else position / COUNTS_PER_DEGREE
+
+    def move_to(self, degree, timeout=60., cancel=None):
+        self.pa(degree)
+        return self.wait_settled(timeout, cancel=cancel)
+
+    def settled(self, tolerance):
+        if self.position is None or self.target is None:
+            return False
+        # drives that never answered MS only have the position to go by
+        stopped = self.status == STOPPED or not self.ms_answered
+        return stopped and abs(self.position - self.target) <= tolerance
+
+    def wait_settled(self, timeout=60., tolerance=COUNTS_PER_DEGREE / 100., cancel=None):
+        # True once the drive reports standstill at the target, False on timeout,
+        # without an open port or once the `cancel` event is set, which is
+        # checked every 0.1 s
+        deadline = monotonic() + timeout
+        step = 1. if cancel is None else 0.1
+        with self.state_changed:
+            while self.feedback and self.worker is not None and not self.settled(tolerance):
+                if cancel is not None and cancel.is_set():
+                    return False
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    self.logger.warning('Move to {} not settled after {}s'.format(self.target, timeout))
+                    return False
+                self.state_changed.wait(min(remaining, step))
+        if self.worker is None:
+            self.logger.warning('Port not open, move to {} not waited for'.format(self.target))
+            return False
+        if not self.feedback:
+            return self.wait_profile(deadline, cancel)
+        return True
+
+    def wait_profile(self, deadline, cancel=None):
+        # without feedback the move takes at most as long as the motion profile
+        if self.move_started is None or self.target is None:
+            return True
+        started, previous = self.move_started
+        distance = abs(self.target - (previous or 0))
+        duration = distance / self.speed + self.speed / self.acceleration + 0.5
+        remaining = min(started + duration, deadline) - monotonic()
+        if remaining > 0:
+            if cancel is None:
+                time.sleep(remaining)
+            elif cancel.wait(remaining):
+                return False
+        return started + duration <= deadline
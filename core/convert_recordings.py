@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+import os
+import sys
+import logging
+import argparse
+
+# runnable as a script as well as with python -m core.convert_recordings
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from core.recording_format import BINARY_EXTENSION, is_csv_recording, load_csv, save
+
+def convert_tree(root, force=False):
+    logger = logging.getLogger('aruco_analyzer.gui.convert_recordings')
+    converted = 0
+    for dir_path, _, file_names in os.walk(root):
+        for name in file_names:
+            fileName = os.path.join(dir_path, name)
+            target = fileName + BINARY_EXTENSION
+            if name.endswith(BINARY_EXTENSION) or not is_csv_recording(fileName):
+                continue
+            if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(fileName):
+                continue
+            save(target, load_csv(fileName))
+            logger.debug('converted {}'.format(fileName))
+            converted += 1
+    logger.info('{} recordings converted in {}'.format(converted, root))
+    return converted
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert CSV recordings into memory-mappable .npy files next to them.')
+    parser.add_argument('paths', nargs='+', help='directories to convert recursively')
+    parser.add_argument('-f', '--force', action='store_true', help='convert even if an up to date .npy exists')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    for path in args.paths:
+        convert_tree(path, args.force)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,33 @@
+import threading
+
+class FrameMailbox(object):
+    # Single-slot, latest-wins hand-over of frames between a producer thread
+    # and the display. Every put starts a new generation; a frame replaced
+    # before it was taken counts as skipped. `notify` is called only when the
+    # slot turns from read to unread, so at most one wake-up is outstanding.
+
+    def __init__(self, notify=None):
+        self.lock = threading.Lock()
+        self.notify = notify
+        self.item = None
+        self.generation = 0
+        self.taken = 0
+        self.skipped = 0
+
+    def put(self, item):
+        with self.lock:
+            if self.generation > self.taken:
+                self.skipped += 1
+            self.item = item
+            self.generation += 1
+            wake = self.generation == self.taken + 1
+        if wake and self.notify is not None:
+            self.notify()
+
+    def take(self, generation):
+        # returns (generation, item), item is None if nothing newer than `generation` arrived
+        with self.lock:
+            if self.generation == generation:
+                return generation, None
+            self.taken = self.generation
+            return self.generation, self.item
@@ -0,0 +1,119 @@
+import time
+import threading
+
+import numpy as np
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+# Segments of the path a detection takes, each one ending at the named stage:
+# analyze  capture -> Broadcaster.broadcast (camera, detection workers, analyzer)
+# queue    broadcast -> dequeued by the consumer
+# process  dequeued -> transformed, recorded and accounted
+# deliver  processed -> frame picked up by the image view
+# paint    picked up -> image painted
+STAGES = ('analyze', 'queue', 'process', 'deliver', 'paint')
+COLUMNS = STAGES + ('total',)
+PERCENTILES = (50, 95, 99)
+
+class Trace(object):
+    # Per-detection stage timestamps. The capture timestamp of aruco_analyzer
+    # is wall clock, so the first segment is measured against time.time(),
+    # all later ones against the monotonic clock.
+
+    __slots__ = ('id', 'capture', 'analyzed', 'stamps', 'reported')
+
+    def __init__(self, id, capture):
+        self.id = id
+        self.capture = capture
+        self.analyzed = time.time()
+        self.stamps = [None] * len(STAGES)
+        self.stamps[0] = monotonic()
+        self.reported = 0
+
+    def mark(self, stage):
+        i = STAGES.index(stage)
+        if self.stamps[i] is None:
+            self.stamps[i] = monotonic()
+
+    def latencies(self):
+        values = np.full(len(COLUMNS), np.nan)
+        values[0] = self.analyzed - self.capture
+        for i in range(1, len(STAGES)):
+            if self.stamps[i] is None or self.stamps[i - 1] is None:
+                break
+            values[i] = self.stamps[i] - self.stamps[i - 1]
+        if self.stamps[-1] is not None:
+            values[-1] = values[0] + self.stamps[-1] - self.stamps[0]
+        return values
+
+class LatencyStats(object):
+    # Rolling window of latencies per column, each column filled independently
+    # since not every detection makes it to the display.
+
+    def __init__(self, window=512):
+        self.window = window
+        self.samples = np.full((len(COLUMNS), window), np.nan)
+        self.counts = np.zeros(len(COLUMNS), dtype=int)
+
+    def add(self, values, first=0):
+        for column in range(first, len(COLUMNS)):
+            if np.isnan(values[column]):
+                continue
+            self.samples[column, self.counts[column] % self.window] = values[column]
+            self.counts[column] += 1
+
+    def percentiles(self):
+        # (columns, percentiles) in seconds, NaN for columns without samples
+        result = np.full((len(COLUMNS), len(PERCENTILES)), np.nan)
+        for column in range(len(COLUMNS)):
+            n = min(self.counts[column], self.window)
+            if n > 0:
+                result[column] = np.percentile(self.samples[column, :n], PERCENTILES)
+        return result
+
+class LatencyMonitor(object):
+
+    def __init__(self, window=512, trace_file=None):
+        self.lock = threading.Lock()
+        self.window = window
+        self.stats = {}
+        self.trace_file = None
+        if trace_file:
+            self.trace_file = open(trace_file, 'w')
+            self.trace_file.write(','.join(('id', 'capture') + COLUMNS) + '\n')
+
+    def ids(self):
+        with self.lock:
+            return sorted(self.stats.keys())
+
+    def add(self, trace):
+        # only the stages reached since the last report of this trace are added
+        values = trace.latencies()
+        reached = 0
+        while reached < len(STAGES) and trace.stamps[reached] is not None:
+            reached += 1
+        with self.lock:
+            if trace.id not in self.stats:
+                self.stats[trace.id] = LatencyStats(self.window)
+            first = trace.reported
+            if reached == len(STAGES):
+                reached = len(COLUMNS)
+            partial = np.full(len(COLUMNS), np.nan)
+            partial[first:reached] = values[first:reached]
+            self.stats[trace.id].add(partial, first)
+            trace.reported = reached
+            if self.trace_file is not None and first < reached:
+                self.trace_file.write('{},{:.6f},{}\n'.format(trace.id, trace.capture,
+                                      ','.join('{:.6f}'.format(v) if not np.isnan(v) else '' for v in partial)))
+
+    def percentiles(self, id):
+        with self.lock:
+            if id not in self.stats:
+                return None
+            return self.stats[id].percentiles()
+
+    def close(self):
+        with self.lock:
+            if self.trace_file is not None:
+                self.trace_file.close()
+                self.trace_file = None
@@ -0,0 +1,125 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+
+# summary of one recording, attitude_std is the RMS rotation (degrees) of the
+# samples about the averaged attitude
+RecordingStats = namedtuple('RecordingStats', ['fileName', 'count', 'position', 'position_std',
+                                               'quaternion', 'attitude_std'])
+
+def average_quaternion(outer):
+    # dominant eigenvector of the summed outer products q q^T (Markley et al.),
+    # indifferent to the sign of the samples
+    eigenvalues, eigenvectors = np.linalg.eigh(outer)
+    quaternion = eigenvectors[:, np.argmax(eigenvalues)]
+    return quaternion if quaternion[0] >= 0 else -quaternion
+
+def attitude_std(quaternion_covariance):
+    # a small rotation by theta moves a unit quaternion by theta/2
+    return math.degrees(2. * math.sqrt(max(np.trace(quaternion_covariance), 0.)))
+
+class OnlineStats(object):
+    # Welford's running mean and covariance of fixed-length vectors, updated
+    # in O(dimension^2) per sample without keeping the samples.
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.clear()
+
+    def clear(self):
+        self.count = 0
+        self.mean = np.zeros(self.dimension)
+        self.m2 = np.zeros((self.dimension, self.dimension))
+
+    def add(self, x):
+        x = np.asarray(x, dtype=float)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += np.outer(delta, x - self.mean)
+
+    def covariance(self):
+        if self.count < 2:
+            return np.full((self.dimension, self.dimension), np.nan)
+        return self.m2 / (self.count - 1)
+
+    def std(self):
+        return np.sqrt(np.diag(self.covariance()))
+
+    def standard_error(self):
+        # of the mean, per component
+        return self.std() / math.sqrt(self.count) if self.count > 0 else np.full(self.dimension, np.nan)
+
+class PoseStats(object):
+    # Running statistics of a recording: position mean and covariance, the
+    # same for the quaternion components with their signs aligned to the
+    # first sample (q and -q are the same attitude), and the summed quaternion
+    # outer products the averaged attitude is taken from.
+
+    def __init__(self):
+        self.position = OnlineStats(3)
+        self.quaternion = OnlineStats(4)
+        self.outer = np.zeros((4, 4))
+        self.first = None
+
+    @property
+    def count(self):
+        return self.position.count
+
+    def clear(self):
+        self.position.clear()
+        self.quaternion.clear()
+        self.outer[:] = 0
+        self.first = None
+
+    def add(self, position, quaternion):
+        quaternion = np.asarray(quaternion, dtype=float)
+        if self.first is None:
+            self.first = quaternion
+        elif np.dot(quaternion, self.first) < 0:
+            quaternion = -quaternion
+        self.position.add(position)
+        self.quaternion.add(quaternion)
+        self.outer += np.outer(quaternion, quaternion)
+
+    def summary(self, fileName=None):
+        if self.count == 0:
+            return RecordingStats(fileName, 0, None, None, None, None)
+        return RecordingStats(fileName, self.count, self.position.mean.copy(),
+                              np.nan_to_num(self.position.std()), average_quaternion(self.outer),
+                              attitude_std(np.nan_to_num(self.quaternion.covariance())))
+
+class SequentialStop(object):
+    # Stops a recording once the mean is known well enough: the confidence
+    # interval (`z` standard errors) on every position component is within
+    # `position_tolerance` meters and on the attitude within
+    # `attitude_tolerance` degrees, after at least `min_samples` samples. The
+    # maximum is the sample count of the recording itself.
+
+    def __init__(self, position_tolerance=0.0002, attitude_tolerance=0.02, min_samples=20, z=1.96):
+        self.position_tolerance = position_tolerance
+        self.attitude_tolerance = attitude_tolerance
+        self.min_samples = min_samples
+        self.z = z
+
+    def done(self, stats):
+        if stats.count < max(self.min_samples, 2):
+            return False
+        if self.z * stats.position.standard_error().max() > self.position_tolerance:
+            return False
+        # a small rotation by theta moves the vector part of a unit quaternion by theta/2
+        attitude = 2. * self.z * stats.quaternion.standard_error()[1:].max()
+        return math.degrees(attitude) <= self.attitude_tolerance
+
+def sequential_stop(adaptive, ignored=()):
+    # SequentialStop from the `adaptive` section of a sweep config, None
+    # without one. Keys in `ignored` belong to the caller, any other unknown
+    # key is a ValueError.
+    settings = dict((key, value) for key, value in (adaptive or {}).items() if key not in ignored)
+    if not settings:
+        return None
+    unknown = set(settings) - set(('position_tolerance', 'attitude_tolerance', 'min_samples', 'z'))
+    if unknown:
+        raise ValueError('unknown adaptive settings: {}'.format(', '.join(sorted(unknown))))
+    return SequentialStop(**settings)
@@ -0,0 +1,98 @@
+import numpy as np
+
+# Batched quaternion helpers. Quaternions are arrays of shape (..., 4) in
+# (w, x, y, z) order, the same convention as pyquaternion and SingleOutput.
+# Every function accepts a single quaternion as well as a stack of them.
+
+CONJUGATE = np.array([1., -1., -1., -1.])
+
+def normalize(q):
+    q = np.asarray(q, dtype=float)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+def conjugate(q):
+    return np.asarray(q, dtype=float) * CONJUGATE
+
+def inverse(q):
+    q = np.asarray(q, dtype=float)
+    return conjugate(q) / np.sum(q * q, axis=-1, keepdims=True)
+
+def multiply(a, b):
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    aw, ax, ay, az = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+    bw, bx, by, bz = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+    return np.stack((
+        aw * bw - ax * bx - ay * by - az * bz,
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+    ), axis=-1)
+
+def rotate(q, v):
+    # q * v * q^-1 for unit quaternions, without building the pure quaternion
+    q = np.asarray(q, dtype=float)
+    v = np.asarray(v, dtype=float)
+    w = q[..., :1]
+    u = q[..., 1:]
+    t = 2. * np.cross(u, v)
+    return v + w * t + np.cross(u, t)
+
+def to_euler(q):
+    # (yaw, pitch, roll) in radians, identical to pyquaternion's yaw_pitch_roll
+    q = normalize(q)
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    yaw = np.arctan2(2. * (w * z - x * y), 1. - 2. * (y * y + z * z))
+    pitch = np.arcsin(np.clip(2. * (w * y + z * x), -1., 1.))
+    roll = np.arctan2(2. * (w * x - y * z), 1. - 2. * (x * x + y * y))
+    return np.stack((yaw, pitch, roll), axis=-1)
+
+def angle(q):
+    # rotation angle in radians, wrapped to [-pi, pi] like pyquaternion's angle
+    q = normalize(q)
+    theta = 2. * np.arctan2(np.linalg.norm(q[..., 1:], axis=-1), q[..., 0])
+    return (theta + np.pi) % (2. * np.pi) - np.pi
+
+def distance(a, b):
+    # absolute angle in radians of the rotation taking a onto b
+    return np.abs(angle(multiply(inverse(a), b)))
+
+def slerp(q0, q1, t):
+    # spherical linear interpolation along the shorter arc, t in [0, 1]
+    q0 = normalize(q0)
+    q1 = normalize(q1)
+    t = np.asarray(t, dtype=float)[..., np.newaxis]
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    q1 = np.where(dot < 0., -q1, q1)
+    dot = np.clip(np.abs(dot), 0., 1.)
+    theta = np.arccos(dot)
+    sin_theta = np.sin(theta)
+    # fall back to linear interpolation for nearly identical attitudes
+    linear = sin_theta < 1e-6
+    sin_theta = np.where(linear, 1., sin_theta)
+    w0 = np.where(linear, 1. - t, np.sin((1. - t) * theta) / sin_theta)
+    w1 = np.where(linear, t, np.sin(t * theta) / sin_theta)
+    return normalize(w0 * q0 + w1 * q1)
+
+def relative_pose(reference_position, reference_quaternion, position, quaternion):
+    # pose of an object expressed in the frame of a reference object
+    q_ref = normalize(reference_quaternion)
+    q_rel = normalize(quaternion)
+    relative_position = rotate(conjugate(q_ref), np.asarray(position, dtype=float) - reference_position)
+    relative_quaternion = multiply(conjugate(q_rel), q_ref)
+    return relative_position, relative_quaternion
+
+def from_axis_angle(axis, angle):
+    axis = np.asarray(axis, dtype=float)
+    axis = axis / np.linalg.norm(axis, axis=-1, keepdims=True)
+    half = np.asarray(angle, dtype=float)[..., np.newaxis] / 2.
+    return np.concatenate((np.cos(half), np.sin(half) * axis), axis=-1)
+
+def to_matrix(q):
+    # rotation matrices of shape (..., 3, 3), applying them equals rotate(q, v)
+    w, x, y, z = np.moveaxis(normalize(q), -1, 0)
+    return np.stack((
+        np.stack((1. - 2. * (y * y + z * z), 2. * (x * y - w * z), 2. * (x * z + w * y)), axis=-1),
+        np.stack((2. * (x * y + w * z), 1. - 2. * (x * x + z * z), 2. * (y * z - w * x)), axis=-1),
+        np.stack((2. * (x * z - w * y), 2. * (y * z + w * x), 1. - 2. * (x * x + y * y)), axis=-1),
+    ), axis=-2)
@@ -0,0 +1,359 @@
+import os
+import logging
+import threading
+
+from aruco_analyzer import SingleOutput
+
+from core import pose
+from core import recording_format
+from core.snapshot import PoseSnapshot
+from core.ring_buffer import RingBuffer
+from core.pose_table import RelativePoseTable
+from core.pose_history import PoseHistory
+from core.latency import LatencyMonitor, Trace, STAGES, monotonic
+from core.rate_estimator import RateEstimator
+from core.recording_buffer import RecordingBuffer
+from core.stream_writer import StreamWriter
+from core.settle_detector import SettleDetector
+from core.online_stats import PoseStats
+
+class PoseBroadcaster(object):
+    # Qt-free analyzer output: queues detections, transforms the tracked
+    # object into the reference frame and records it. The GUIs wrap it and
+    # turn the on_* callbacks into signals, the headless recorder uses it as is.
+    # Callbacks run on the consumer thread, on_stopped/on_timeout may also run
+    # on the timeout timer or the caller of stopRecording.
+
+    def __init__(self, queue_size=256, batch_size=32, history_size=64, latency_trace=None):
+        self.logger = logging.getLogger('aruco_analyzer.gui.broadcaster')
+
+        # (desired, reference), replaced as a whole by the GUI thread so that
+        # the consumer reads one consistent pair per target
+        self.selection = (None, 'Camera')
+        self.selection_lock = threading.Lock()
+        self.detectedObjects = {}
+
+        self.on_tracked_object = None
+        self.on_pose = None
+        self.on_progress = None
+        self.on_stopped = None
+        self.on_timeout = None
+        self.on_saved = None
+
+        self.record = False
+        self.sample_counter = 0
+        self.max_samples = 500
+        self.record_timeout = 5000
+        self.timer = None
+        self.writer = None
+        self.save_on_stop = None
+        self.record_lock = threading.Lock()
+        # statistics of the current recording, and an optional SequentialStop
+        # that ends it early once they are precise enough
+        self.stats = PoseStats()
+        self.stopping_rule = None
+
+        self.recording = RecordingBuffer(stages=STAGES)
+        self.latency = LatencyMonitor(trace_file=latency_trace)
+        self.pose_table = RelativePoseTable()
+        self.history_size = history_size
+        self.histories = {}
+        self.rates = {}
+        # rates are read by the GUI thread, see rate_stats()
+        self.rates_lock = threading.Lock()
+        # fed with the tracked object relative to the reference
+        self.settle = SettleDetector()
+
+        # the analyzer thread only enqueues, everything else happens on the consumer
+        self.queue = RingBuffer(queue_size)
+        self.batch_size = batch_size
+        self.pending = threading.Event()
+        # targets the consumer is done with, see flush()
+        self.processed = 0
+        self.processed_changed = threading.Condition()
+        self.consumer = threading.Thread(target=self.consume)
+        self.consumer.daemon = True
+        self.consumer.start()
+
+    @property
+    def desiredObject(self):
+        return self.selection[0]
+
+    @property
+    def referenceObject(self):
+        return self.selection[1]
+
+    @property
+    def tracked_object(self):
+        return self.desiredObject
+
+    @property
+    def dropped(self):
+        return self.queue.dropped
+
+    def broadcast(self, target):
+        target.trace = Trace(target.get_unique_ar_id_string(), target.timestamp)
+        self.queue.push(target)
+        self.pending.set()
+
+    def consume(self):
+        while True:
+            self.pending.wait()
+            self.pending.clear()
+            while len(self.queue) > 0:
+                latest = None
+                batch = self.queue.drain(self.batch_size)
+                for target in batch:
+                    selection = self.selection
+                    # one bad detection must not end the consumer
+                    try:
+                        target.trace.mark('queue')
+                        transformed = self.process(target, selection)
+                        target.trace.mark('process')
+                        self.latency.add(target.trace)
+                    except Exception:
+                        self.logger.exception('Failed to process {}'.format(target.get_unique_ar_id_string()))
+                        continue
+                    if transformed is not None:
+                        latest = (transformed, selection)
+                # only the newest pose of a batch is worth displaying
+                if latest is not None:
+                    try:
+                        self.emit_target(*latest)
+                    except Exception:
+                        self.logger.exception('Failed to emit the tracked pose')
+                with self.processed_changed:
+                    self.processed += len(batch)
+                    self.processed_changed.notify_all()
+
+    def flush(self, timeout=None):
+        # waits until every target broadcast so far has been processed and
+        # emitted, False on timeout
+        pushed = self.queue.pushed
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.processed_changed:
+            while self.processed < pushed:
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.processed_changed.wait(remaining)
+            return True
+
+    def process(self, target, selection):
+        desired, reference = selection
+        id = target.get_unique_ar_id_string()
+
+        if id not in self.detectedObjects and self.on_tracked_object is not None:
+            self.on_tracked_object(id)
+
+        self.detectedObjects[id] = target
+        if id not in self.histories:
+            self.histories[id] = PoseHistory(self.history_size)
+        self.histories[id].append(target.timestamp, target.position, target.quaternion)
+        with self.rates_lock:
+            if id not in self.rates:
+                self.rates[id] = RateEstimator()
+            # arrival time at the broadcaster, independent of how the queue is drained
+            self.rates[id].add(target.trace.stamps[0])
+        self.pose_table.update(id, target.timestamp, target.position, target.quaternion)
+
+        if id != desired or not self.has_reference(reference):
+            return None
+
+        target = self.calculate_transformation(reference, desired)
+        self.settle.add(target.timestamp, target.position, target.quaternion)
+
+        done = False
+        with self.record_lock:
+            if self.record is True:
+                self.sample_counter += 1
+                if self.writer is not None:
+                    self.writer.append_target(target)
+                else:
+                    self.recording.append_target(target, target.trace.latencies()[:len(STAGES)])
+                self.stats.add(target.position, target.quaternion)
+                done = self.max_samples != 0 and self.sample_counter >= self.max_samples
+                if self.stopping_rule is not None and self.stopping_rule.done(self.stats):
+                    done = True
+                progress = self.sample_counter
+            else:
+                progress = None
+        if progress is not None and self.on_progress is not None:
+            self.on_progress(progress, self.max_samples)
+        if done:
+            self.stopRecording()
+
+        return target
+
+    def rate_stats(self):
+        # {id: RateStats or None} of every object seen, safe from any thread
+        with self.rates_lock:
+            return dict((id, rate.stats()) for id, rate in self.rates.items())
+
+    def has_reference(self, reference):
+        return reference == 'Camera' or reference in self.histories
+
+    def emit_target(self, target, selection):
+        if self.on_pose is None:
+            return
+
+        desired, reference = selection
+        if reference == 'Camera':
+            reference_timestamp = None
+            reference_rate = None
+        else:
+            reference_timestamp = self.detectedObjects[reference].timestamp
+            reference_rate = self.rates[reference].stats()
+
+        self.on_pose(target, PoseSnapshot(
+            object_id=desired,
+            reference_id=reference,
+            position=target.position,
+            euler=target.euler,
+            timestamp=target.timestamp,
+            reference_timestamp=reference_timestamp,
+            rate=self.rates[desired].stats(),
+            reference_rate=reference_rate,
+            dropped=self.dropped,
+            trace=getattr(target, 'trace', None)))
+
+    def set_desired_object(self, sample_id):
+        self.settle.reset()
+        with self.selection_lock:
+            self.selection = (sample_id or None, self.selection[1])
+            selection = self.selection
+        desired, reference = selection
+        if desired in self.detectedObjects and self.has_reference(reference):
+            self.emit_target(self.calculate_transformation(reference, desired), selection)
+
+    def set_stopping_rule(self, rule):
+        # None records until max_samples
+        with self.record_lock:
+            self.stopping_rule = rule
+
+    def set_reference_object(self, reference_id):
+        self.settle.reset()
+        with self.selection_lock:
+            self.selection = (self.selection[0], reference_id)
+
+    def calculate_transformation(self, reference_id, relative_id):
+        if reference_id == 'Camera':
+            return self.detectedObjects[relative_id]
+
+        relative = self.detectedObjects[relative_id]
+
+        timestamp = relative.timestamp
+
+        # reference pose at the capture time of the relative detection
+        reference_position, reference_quaternion = self.histories[reference_id].at(timestamp)
+
+        transformed_position, q_rel_ref = pose.relative_pose(
+            reference_position, reference_quaternion, relative.position, relative.quaternion)
+
+        transformed = SingleOutput()
+        transformed.camera_image = getattr(relative, 'camera_image', None)
+        transformed.ar_id = relative.ar_id
+        transformed.quaternion = q_rel_ref
+        transformed.position = transformed_position
+        transformed.timestamp = timestamp
+        transformed.marker_type = relative.marker_type
+        transformed.trace = relative.trace
+
+        return transformed
+
+    def startRecording(self, samples, record_timeout, fileName=None):
+        # with a file name samples are streamed to disk while recording,
+        # samples=0 records until stopped, record_timeout (ms) 0 never times out
+        if self.desiredObject is None:
+            return False
+        with self.record_lock:
+            self.max_samples = samples
+            self.record_timeout = record_timeout
+            self.recording.clear()
+            # only CSV can be streamed, binary files are written once recording stops
+            self.save_on_stop = None
+            if fileName is not None and not recording_format.is_binary(fileName):
+                try:
+                    self.writer = StreamWriter(fileName, on_finished=self.onWriterFinished)
+                except (IOError, OSError) as e:
+                    self.logger.error('Failed to open {}: {}'.format(fileName, e))
+                    return False
+            else:
+                self.save_on_stop = fileName
+                self.recording.reserve(samples)
+            self.sample_counter = 0
+            self.stats.clear()
+            self.record = True
+            if self.record_timeout != 0:
+                self.timer = threading.Timer(self.record_timeout / 1000., self.recordingTimedOut)
+                self.timer.daemon = True
+                self.timer.start()
+        return True
+
+    def recordingTimedOut(self):
+        if self.stopRecording() and self.on_timeout is not None:
+            self.on_timeout()
+
+    def stopRecording(self):
+        with self.record_lock:
+            if not self.record:
+                return False
+            self.logger.info('{}/{} samples recorded'.format(self.sample_counter, self.max_samples))
+            self.record = False
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.writer is not None:
+                self.writer.commit()
+                self.writer = None
+            fileName, self.save_on_stop = self.save_on_stop, None
+        if self.on_stopped is not None:
+            self.on_stopped()
+        if fileName is not None:
+            self.saveToFile(fileName)
+        return True
+
+    def onWriterFinished(self, fileName):
+        if fileName is None:
+            # a failed stream ends the recording, nothing more can be written
+            self.stopRecording()
+        elif self.on_saved is not None:
+            self.on_saved(fileName)
+
+    def summary(self):
+        # statistics of the current or last recording, kept while recording
+        with self.record_lock:
+            return self.stats.summary()
+
+    def takeRecording(self):
+        # the recorded samples as a copy owned by the caller, the buffer is
+        # cleared for the next recording
+        with self.record_lock:
+            samples = self.recording.samples.copy()
+            self.recording.clear()
+        if self.on_progress is not None:
+            self.on_progress(0, self.max_samples)
+        return samples
+
+    def close(self):
+        # flushes the latency trace, call it once when shutting down
+        self.latency.close()
+
+    def saveToFile(self, fileName):
+        # .npy files are written as binary, everything else as CSV
+        if not fileName:
+            return False
+        dir_path = os.path.dirname(os.path.realpath(fileName))
+        try:
+            if not os.path.isdir(dir_path):
+                os.makedirs(dir_path)
+            recording_format.save(fileName, self.recording.samples)
+        except (IOError, OSError) as e:
+            self.logger.error('Failed to save {}: {}'.format(fileName, e))
+            return False
+        self.recording.clear()
+        if self.on_progress is not None:
+            self.on_progress(0, self.max_samples)
+        if self.on_saved is not None:
+            self.on_saved(fileName)
+        return True
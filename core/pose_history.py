@@ -0,0 +1,56 @@
+import numpy as np
+
+from core import pose
+
+class PoseHistory(object):
+    # Bounded, timestamped pose history of a single object. Poses in between
+    # two detections are interpolated (linear for the position, SLERP for the
+    # attitude); outside of the stored range the nearest pose is returned.
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.timestamps = np.full(capacity, np.nan)
+        self.positions = np.zeros((capacity, 3))
+        self.quaternions = np.zeros((capacity, 4))
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp, position, quaternion):
+        i = self.count % self.capacity
+        self.timestamps[i] = timestamp
+        self.positions[i] = position
+        self.quaternions[i] = quaternion
+        self.count += 1
+
+    def latest(self):
+        if self.count == 0:
+            return None
+        i = (self.count - 1) % self.capacity
+        return self.timestamps[i], self.positions[i], self.quaternions[i]
+
+    def at(self, timestamp):
+        n = len(self)
+        if n == 0:
+            return None
+
+        # detection workers may deliver out of order, so sort by capture time
+        indices = np.arange(self.count - n, self.count) % self.capacity
+        indices = indices[np.argsort(self.timestamps[indices], kind='mergesort')]
+        timestamps = self.timestamps[indices]
+
+        k = np.searchsorted(timestamps, timestamp)
+        if k == 0:
+            i = indices[0]
+            return self.positions[i], self.quaternions[i]
+        if k == n:
+            i = indices[-1]
+            return self.positions[i], self.quaternions[i]
+
+        i0, i1 = indices[k - 1], indices[k]
+        dt = timestamps[k] - timestamps[k - 1]
+        t = (timestamp - timestamps[k - 1]) / dt if dt > 0 else 0.
+        position = self.positions[i0] + t * (self.positions[i1] - self.positions[i0])
+        quaternion = pose.slerp(self.quaternions[i0], self.quaternions[i1], t)
+        return position, quaternion
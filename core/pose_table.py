@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+
+from core import pose
+
+class RelativePoseTable(object):
+    # Relative pose of every tracked object with respect to every other one.
+    # relative_positions[i, j] / relative_quaternions[i, j] hold the pose of
+    # object j in the frame of reference object i. An update of object i only
+    # recomputes row i and column i.
+
+    def __init__(self, capacity=8):
+        self.lock = threading.Lock()
+        self.ids = []
+        self.index = {}
+        self.version = 0
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        n = len(self.ids)
+        positions = np.full((capacity, 3), np.nan)
+        quaternions = np.full((capacity, 4), np.nan)
+        timestamps = np.full(capacity, np.nan)
+        relative_positions = np.full((capacity, capacity, 3), np.nan)
+        relative_quaternions = np.full((capacity, capacity, 4), np.nan)
+        if n > 0:
+            positions[:n] = self.positions[:n]
+            quaternions[:n] = self.quaternions[:n]
+            timestamps[:n] = self.timestamps[:n]
+            relative_positions[:n, :n] = self.relative_positions[:n, :n]
+            relative_quaternions[:n, :n] = self.relative_quaternions[:n, :n]
+        self.positions = positions
+        self.quaternions = quaternions
+        self.timestamps = timestamps
+        self.relative_positions = relative_positions
+        self.relative_quaternions = relative_quaternions
+
+    def __len__(self):
+        return len(self.ids)
+
+    def update(self, id, timestamp, position, quaternion):
+        with self.lock:
+            if id not in self.index:
+                if len(self.ids) == len(self.positions):
+                    self.allocate(2 * len(self.positions))
+                self.index[id] = len(self.ids)
+                self.ids.append(id)
+
+            i = self.index[id]
+            n = len(self.ids)
+            self.positions[i] = position
+            self.quaternions[i] = pose.normalize(quaternion)
+            self.timestamps[i] = timestamp
+
+            positions = self.positions[:n]
+            quaternions = self.quaternions[:n]
+            # row: every object seen from the updated one
+            self.relative_positions[i, :n], self.relative_quaternions[i, :n] = pose.relative_pose(
+                positions[i], quaternions[i], positions, quaternions)
+            # column: the updated object seen from every other one
+            self.relative_positions[:n, i], self.relative_quaternions[:n, i] = pose.relative_pose(
+                positions, quaternions, positions[i], quaternions[i])
+            self.version += 1
+
+    def snapshot(self):
+        with self.lock:
+            n = len(self.ids)
+            return (self.version, list(self.ids),
+                    self.relative_positions[:n, :n].copy(),
+                    self.relative_quaternions[:n, :n].copy())
@@ -0,0 +1,66 @@
+from collections import namedtuple
+
+import numpy as np
+
+from core.latency import monotonic
+
+RateStats = namedtuple('RateStats', ['rate', 'instantaneous', 'ewma', 'min_gap', 'max_gap', 'dropouts'])
+
+class RateEstimator(object):
+    # Update rate of one object from the monotonic arrival times of its last
+    # `window` detections. A gap longer than `dropout_factor` times the
+    # smoothed inter-arrival time counts as a dropout. Once the silence since
+    # the last detection is that long too, it counts as a growing gap, so the
+    # rates of an object that stopped arriving decay, and after `max_age`
+    # seconds it has no stats at all.
+
+    def __init__(self, window=64, alpha=0.1, dropout_factor=3., max_age=5.):
+        self.window = window
+        self.alpha = alpha
+        self.dropout_factor = dropout_factor
+        self.max_age = max_age
+        self.arrivals = np.full(window, np.nan)
+        self.count = 0
+        self.ewma_gap = None
+        self.dropouts = 0
+
+    def add(self, timestamp=None):
+        if timestamp is None:
+            timestamp = monotonic()
+        if self.count > 0:
+            gap = timestamp - self.arrivals[(self.count - 1) % self.window]
+            if self.ewma_gap is None:
+                self.ewma_gap = gap
+            else:
+                if gap > self.dropout_factor * self.ewma_gap:
+                    self.dropouts += 1
+                self.ewma_gap = self.alpha * gap + (1. - self.alpha) * self.ewma_gap
+        self.arrivals[self.count % self.window] = timestamp
+        self.count += 1
+
+    def stats(self, now=None):
+        n = min(self.count, self.window)
+        if n < 2:
+            return None
+        if now is None:
+            now = monotonic()
+        indices = np.arange(self.count - n, self.count) % self.window
+        gaps = np.diff(self.arrivals[indices])
+        span = self.arrivals[indices[-1]] - self.arrivals[indices[0]]
+        silence = now - self.arrivals[indices[-1]]
+        if silence > self.max_age:
+            return None
+        ewma_gap = self.ewma_gap
+        max_gap = gaps.max()
+        # shorter silences are just the wait for the next detection
+        if silence > self.dropout_factor * ewma_gap:
+            span += silence
+            ewma_gap = silence
+            max_gap = max(max_gap, silence)
+        return RateStats(
+            rate=(n - 1) / span if span > 0 else np.inf,
+            instantaneous=1. / gaps[-1] if gaps[-1] > 0 else np.inf,
+            ewma=1. / ewma_gap if ewma_gap > 0 else np.inf,
+            min_gap=gaps.min(),
+            max_gap=max_gap,
+            dropouts=self.dropouts)
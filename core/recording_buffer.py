@@ -0,0 +1,71 @@
+import numpy as np
+
+ID_LENGTH = 16
+
+def recording_dtype(stages=()):
+    fields = [
+        ('id', 'U{}'.format(ID_LENGTH)),
+        ('timestamp', 'f8'),
+        ('position', 'f8', (3,)),
+        ('quaternion', 'f8', (4,)),
+    ]
+    if stages:
+        fields.append(('latency', 'f8', (len(stages),)))
+    return np.dtype(fields)
+
+def to_csv_lines(samples):
+    # same layout as SingleOutput.toCSV(): id,x,y,z,qw,qx,qy,qz
+    values = np.column_stack((samples['position'], samples['quaternion']))
+    lines = samples['id']
+    for i in range(values.shape[1]):
+        lines = np.char.add(np.char.add(lines, ','), np.char.mod('%.15g', values[:, i]))
+    return lines
+
+class RecordingBuffer(object):
+    # Columnar store for recorded poses. Rows live in a preallocated structured
+    # array which grows by doubling, images are never kept.
+
+    min_capacity = 512
+    max_reserve = 1 << 16
+
+    def __init__(self, capacity=min_capacity, stages=()):
+        self.stages = tuple(stages)
+        self.dtype = recording_dtype(self.stages)
+        self.data = np.zeros(max(capacity, 1), dtype=self.dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def samples(self):
+        return self.data[:self.size]
+
+    def clear(self):
+        self.size = 0
+
+    def reserve(self, capacity):
+        capacity = min(capacity, self.max_reserve)
+        if capacity > len(self.data):
+            self.resize(capacity)
+
+    def resize(self, capacity):
+        data = np.zeros(capacity, dtype=self.dtype)
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+
+    def append(self, id, timestamp, position, quaternion, latency=None):
+        if self.size == len(self.data):
+            self.resize(max(2 * len(self.data), self.min_capacity))
+        i = self.size
+        self.data['id'][i] = id
+        self.data['timestamp'][i] = timestamp
+        self.data['position'][i] = position
+        self.data['quaternion'][i] = quaternion
+        if latency is not None and self.stages:
+            self.data['latency'][i] = latency
+        self.size += 1
+
+    def append_target(self, target, latency=None):
+        self.append(target.get_unique_ar_id_string(), target.timestamp,
+                    target.position, target.quaternion, latency)
@@ -0,0 +1,74 @@
+import io
+import os
+import re
+
+import numpy as np
+
+from core.recording_buffer import ID_LENGTH, recording_dtype, to_csv_lines
+
+# Recordings are either the headerless CSV written by SingleOutput.toCSV()
+# (id,x,y,z,qw,qx,qy,qz) or a .npy file holding the structured array of
+# RecordingBuffer. The .npy header carries the dtype, so the file is its own
+# schema and can be memory-mapped.
+
+BINARY_EXTENSION = '.npy'
+CSV_PATTERN = re.compile(r'^[A-Za-z]+\d+,')
+
+def is_binary(fileName):
+    return fileName.endswith(BINARY_EXTENSION)
+
+def dumps(samples, binary=False):
+    if binary:
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(samples))
+        return buffer.getvalue()
+    if len(samples) == 0:
+        return b''
+    return ('\n'.join(to_csv_lines(samples)) + '\n').encode('UTF-8')
+
+def save(fileName, samples):
+    binary = is_binary(fileName)
+    data = dumps(samples, binary)
+    temp_name = fileName + '.part'
+    with open(temp_name, 'wb') as file:
+        file.write(data)
+    os.rename(temp_name, fileName)
+
+def load_csv(fileName):
+    columns = [('id', 'U{}'.format(ID_LENGTH))] + [('c{}'.format(i), 'f8') for i in range(7)]
+    raw = np.atleast_1d(np.genfromtxt(fileName, delimiter=',', dtype=columns, encoding='UTF-8'))
+    samples = np.zeros(len(raw), dtype=recording_dtype())
+    samples['id'] = raw['id']
+    # the CSV layout has no timestamp column
+    samples['timestamp'] = np.nan
+    samples['position'] = np.column_stack([raw['c{}'.format(i)] for i in range(3)])
+    samples['quaternion'] = np.column_stack([raw['c{}'.format(i)] for i in range(3, 7)])
+    return samples
+
+def load(fileName, mmap_mode='r'):
+    # prefers a converted binary sibling of a CSV recording unless the CSV is newer
+    binary = fileName + BINARY_EXTENSION
+    if not is_binary(fileName) and os.path.exists(binary) and \
+            (not os.path.exists(fileName) or os.path.getmtime(binary) >= os.path.getmtime(fileName)):
+        fileName = binary
+    if is_binary(fileName):
+        return np.load(fileName, mmap_mode=mmap_mode)
+    return load_csv(fileName)
+
+def list_recordings(path):
+    # recording names in a directory, binary siblings collapsed onto their CSV name
+    names = set()
+    for name in os.listdir(path):
+        if name.endswith('.part'):
+            continue
+        if is_binary(name):
+            name = name[:-len(BINARY_EXTENSION)]
+        names.add(name)
+    return list(names)
+
+def is_csv_recording(fileName):
+    try:
+        with open(fileName, 'r') as file:
+            return CSV_PATTERN.match(file.readline()) is not None
+    except (IOError, UnicodeDecodeError):
+        return False
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+import threading
+
+import numpy as np
+
+from aruco_analyzer import SingleOutput
+
+from core.latency import monotonic
+from core.recording_buffer import recording_dtype
+from core.recording_format import load, list_recordings, is_binary, is_csv_recording
+
+ID_PATTERN = re.compile(r'^([A-Za-z]+)(\d+)$')
+
+def natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+def find_recordings(paths):
+    # files are taken as they are, directories contribute their recordings in natural order
+    fileNames = []
+    for path in paths:
+        if not os.path.isdir(path):
+            fileNames.append(path)
+            continue
+        for name in sorted(list_recordings(path), key=natural_key):
+            fileName = os.path.join(path, name)
+            if os.path.isfile(fileName + '.npy') or is_binary(fileName) or is_csv_recording(fileName):
+                fileNames.append(fileName)
+    return fileNames
+
+class ReplaySource(object):
+    # Feeds recorded samples to a broadcaster as SingleOutput targets, in
+    # place of ARMarkerDetector.launch_analyzer. Recordings that carry
+    # timestamps are merged and replayed with their original spacing divided
+    # by `speed`, CSV recordings have none and are played back one after the
+    # other at `rate` samples per second. speed=0 replays as fast as the
+    # broadcaster's queue takes the targets, without dropping any.
+    # Targets are stamped with the replay time and have no camera image.
+
+    def __init__(self, fileNames, speed=1.0, rate=30., loop=False):
+        self.logger = logging.getLogger('aruco_analyzer.gui.replay')
+        self.speed = speed
+        self.loop = loop
+        self.sent = 0
+        self.running = threading.Event()
+        self.finished = threading.Event()
+        self.thread = None
+
+        recordings = [load(fileName) for fileName in fileNames]
+        # binary recordings may carry extra fields like latency, only the pose is replayed
+        self.samples = np.zeros(sum(len(r) for r in recordings), dtype=recording_dtype())
+        if len(self.samples) == 0:
+            raise ValueError('no samples in {}'.format(', '.join(fileNames)))
+        for field in self.samples.dtype.names:
+            self.samples[field] = np.concatenate([r[field] for r in recordings])
+
+        timestamps = self.samples['timestamp']
+        if np.isnan(timestamps).any():
+            self.offsets = np.arange(len(self.samples)) / float(rate)
+        else:
+            order = np.argsort(timestamps, kind='mergesort')
+            self.samples = self.samples[order]
+            self.offsets = timestamps[order] - timestamps[order[0]]
+
+        # parse every distinct id once instead of per target
+        self.ids = {}
+        for id in np.unique(self.samples['id']):
+            match = ID_PATTERN.match(id)
+            if match is None:
+                raise ValueError('invalid marker id {}'.format(id))
+            self.ids[id] = (match.group(1), int(match.group(2)))
+        self.logger.info('{} samples from {} recordings'.format(len(self.samples), len(fileNames)))
+
+    def __len__(self):
+        return len(self.samples)
+
+    def targets(self):
+        positions = self.samples['position']
+        quaternions = self.samples['quaternion']
+        for i, id in enumerate(self.samples['id']):
+            target = SingleOutput()
+            target.marker_type, target.ar_id = self.ids[id]
+            target.position = positions[i].copy()
+            target.quaternion = quaternions[i].copy()
+            target.camera_image = None
+            yield target
+
+    def launch_analyzer(self, broadcaster):
+        self.running.set()
+        self.finished.clear()
+        self.thread = threading.Thread(target=self.run, args=(broadcaster,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+
+    def wait(self, timeout=None):
+        return self.finished.wait(timeout)
+
+    def run(self, broadcaster):
+        queue = getattr(broadcaster, 'queue', None)
+        try:
+            while self.running.is_set():
+                self.replay(broadcaster, queue)
+                if not self.loop:
+                    break
+        finally:
+            self.running.clear()
+            self.finished.set()
+
+    def replay(self, broadcaster, queue):
+        start = monotonic()
+        for offset, target in zip(self.offsets, self.targets()):
+            if not self.running.is_set():
+                return
+            if self.speed > 0:
+                wait = start + offset / self.speed - monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            elif queue is not None:
+                while len(queue) >= queue.capacity and self.running.is_set():
+                    time.sleep(0.0005)
+            target.timestamp = time.time()
+            broadcaster.broadcast(target)
+            self.sent += 1
+
+def main(argv=None):
+    from core.pose_broadcaster import PoseBroadcaster
+    from core.latency import COLUMNS
+
+    parser = argparse.ArgumentParser(description='Replay recordings through the broadcaster and report its throughput.')
+    parser.add_argument('paths', nargs='+', help='recordings or directories of recordings')
+    parser.add_argument('-s', '--speed', type=float, default=0, help='replay speed, 1 is real time, 0 as fast as possible (default)')
+    parser.add_argument('--rate', type=float, default=30., help='sample rate of recordings without timestamps')
+    parser.add_argument('-t', '--tracked', help='id to transform and record, defaults to the first id replayed')
+    parser.add_argument('-r', '--reference', default='Camera', help='id of the reference object (default: Camera)')
+    parser.add_argument('-o', '--output', help='record the tracked object into this file')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    source = ReplaySource(find_recordings(args.paths), args.speed, args.rate)
+    broadcaster = PoseBroadcaster()
+    broadcaster.set_reference_object(args.reference)
+    broadcaster.set_desired_object(args.tracked or source.samples['id'][0])
+    if args.output is not None:
+        broadcaster.startRecording(0, 0)
+
+    start = monotonic()
+    source.launch_analyzer(broadcaster)
+    source.wait()
+    broadcaster.flush()
+    elapsed = monotonic() - start
+
+    print('{} targets in {:.3f}s, {:.0f} targets/s, {} dropped'.format(
+        source.sent, elapsed, source.sent / elapsed, broadcaster.dropped))
+    for id in broadcaster.latency.ids():
+        values = broadcaster.latency.percentiles(id) * 1000
+        print('{} p50/p95/p99 ms: {}'.format(id, ', '.join(
+            '{} {:.3f}/{:.3f}/{:.3f}'.format(column, *values[i]) for i, column in enumerate(COLUMNS)
+            if not np.isnan(values[i]).all())))
+    if args.output is not None:
+        broadcaster.stopRecording()
+        broadcaster.saveToFile(args.output)
+
+if __name__ == '__main__':
+    sys.exit(main())
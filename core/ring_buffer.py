@@ -0,0 +1,42 @@
+class RingBuffer(object):
+    # Bounded single-producer/single-consumer queue. The producer only ever
+    # writes `head`, the consumer only ever writes `tail`, so no lock is needed
+    # as long as there is exactly one thread on each side.
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.head - self.tail
+
+    @property
+    def pushed(self):
+        return self.head
+
+    def push(self, item):
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            return False
+        self.slots[head % self.capacity] = item
+        # publish the slot only after it has been written
+        self.head = head + 1
+        return True
+
+    def drain(self, max_items=None):
+        tail = self.tail
+        head = self.head
+        if max_items is not None:
+            head = min(head, tail + max_items)
+
+        items = []
+        for i in range(tail, head):
+            index = i % self.capacity
+            items.append(self.slots[index])
+            self.slots[index] = None
+        self.tail = head
+        return items
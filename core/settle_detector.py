@@ -0,0 +1,82 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+from core import pose
+from core.latency import monotonic
+
+class SettleDetector(object):
+    # Decides from the detections of the tracked object when it has come to
+    # rest. Over the last `window` seconds of capture time the rotation rate
+    # (degrees per second, between the mean attitudes of the older and the
+    # newer half of the window) and the standard deviation of the position
+    # (meters, largest axis) have to stay below their thresholds. Averaging
+    # halves keeps the per-frame jitter of the detection out of the rate.
+
+    def __init__(self, window=0.5, max_rotation_rate=0.5, max_position_std=0.0005, min_samples=5):
+        self.window = window
+        self.max_rotation_rate = max_rotation_rate
+        self.max_position_std = max_position_std
+        self.min_samples = min_samples
+        self.samples = deque()
+        self.stable = False
+        self.condition = threading.Condition()
+
+    def configure(self, window=None, max_rotation_rate=None, max_position_std=None):
+        with self.condition:
+            if window is not None:
+                self.window = window
+            if max_rotation_rate is not None:
+                self.max_rotation_rate = max_rotation_rate
+            if max_position_std is not None:
+                self.max_position_std = max_position_std
+
+    def reset(self):
+        with self.condition:
+            self.samples.clear()
+            self.stable = False
+
+    def add(self, timestamp, position, quaternion):
+        with self.condition:
+            self.samples.append((timestamp, np.asarray(position, dtype=float), pose.normalize(quaternion)))
+            while self.samples[-1][0] - self.samples[0][0] > self.window:
+                self.samples.popleft()
+            self.stable = self.evaluate()
+            if self.stable:
+                self.condition.notify_all()
+
+    def evaluate(self):
+        n = len(self.samples)
+        # the window has to be covered, a reset right after a move is not rest
+        if n < self.min_samples or self.samples[-1][0] - self.samples[0][0] < 0.9 * self.window:
+            return False
+        timestamps = np.array([s[0] for s in self.samples])
+        positions = np.array([s[1] for s in self.samples])
+        quaternions = np.array([s[2] for s in self.samples])
+
+        if positions.std(axis=0).max() > self.max_position_std:
+            return False
+
+        # q and -q are the same attitude, align the signs before averaging
+        quaternions *= np.where(quaternions.dot(quaternions[0]) < 0, -1., 1.)[:, np.newaxis]
+        half = n // 2
+        older = pose.normalize(quaternions[:half].mean(axis=0))
+        newer = pose.normalize(quaternions[half:].mean(axis=0))
+        dt = timestamps[half:].mean() - timestamps[:half].mean()
+        if dt <= 0:
+            return False
+        return math.degrees(pose.distance(older, newer)) / dt <= self.max_rotation_rate
+
+    def wait(self, timeout, cancel=None):
+        # True once at rest, False if it did not settle within `timeout` seconds
+        # or the `cancel` event was set, which is checked every 0.1 s
+        deadline = monotonic() + timeout
+        with self.condition:
+            while not self.stable:
+                remaining = deadline - monotonic()
+                if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                    return False
+                self.condition.wait(remaining if cancel is None else min(remaining, 0.1))
+            return True
@@ -0,0 +1,16 @@
+from collections import namedtuple
+
+# Compact, immutable view of the latest relative pose of the tracked object.
+# Position is in meters, euler angles in radians; formatting is left to the GUI.
+PoseSnapshot = namedtuple('PoseSnapshot', [
+    'object_id',
+    'reference_id',
+    'position',
+    'euler',
+    'timestamp',
+    'reference_timestamp',
+    'rate',
+    'reference_rate',
+    'dropped',
+    'trace',
+])
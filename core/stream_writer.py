@@ -0,0 +1,115 @@
+import os
+import time
+import logging
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import numpy as np
+
+from core.recording_buffer import recording_dtype, to_csv_lines
+
+class StreamWriter(object):
+    # Write-behind CSV writer. Samples are queued by the caller and written in
+    # batches by a background thread into a temporary file, which is renamed
+    # onto the final name on commit (the same guarantee QSaveFile gives).
+    # A failed write ends the thread with the exception in `error` and
+    # on_finished(None).
+
+    COMMIT = 'commit'
+    CANCEL = 'cancel'
+
+    def __init__(self, fileName, batch_size=256, flush_interval=1.0, on_finished=None):
+        self.logger = logging.getLogger('aruco_analyzer.gui.stream_writer')
+        self.fileName = os.path.realpath(fileName)
+        self.temp_name = self.fileName + '.part'
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_finished = on_finished
+        self.dtype = recording_dtype()
+        self.written = 0
+        self.error = None
+
+        dir_path = os.path.dirname(self.fileName)
+        if not os.path.isdir(dir_path):
+            os.makedirs(dir_path)
+        self.file = open(self.temp_name, 'w')
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def append(self, id, timestamp, position, quaternion):
+        self.queue.put((id, timestamp, position, quaternion))
+
+    def append_target(self, target):
+        self.append(target.get_unique_ar_id_string(), target.timestamp,
+                    target.position, target.quaternion)
+
+    def commit(self):
+        self.queue.put(self.COMMIT)
+
+    def cancel(self):
+        self.queue.put(self.CANCEL)
+
+    def wait(self, timeout=None):
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+    def write_batch(self, batch):
+        if not batch:
+            return
+        samples = np.array(batch, dtype=self.dtype)
+        self.file.write('\n'.join(to_csv_lines(samples)) + '\n')
+        self.written += len(batch)
+        del batch[:]
+
+    def run(self):
+        try:
+            self.write_all()
+        except (IOError, OSError) as e:
+            self.logger.error('Failed to write {}: {}'.format(self.fileName, e))
+            self.error = e
+            try:
+                self.file.close()
+            except (IOError, OSError):
+                pass
+            if self.on_finished is not None:
+                self.on_finished(None)
+
+    def write_all(self):
+        batch = []
+        last_flush = time.time()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            if item is self.COMMIT or item is self.CANCEL:
+                self.write_batch(batch)
+                self.finish(item is self.COMMIT)
+                return
+
+            if item is not None:
+                batch.append(item)
+
+            if len(batch) >= self.batch_size or time.time() - last_flush > self.flush_interval:
+                self.write_batch(batch)
+                self.file.flush()
+                last_flush = time.time()
+
+    def finish(self, commit):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        if commit:
+            os.rename(self.temp_name, self.fileName)
+            self.logger.info('{} samples written to {}'.format(self.written, self.fileName))
+        else:
+            os.remove(self.temp_name)
+        if self.on_finished is not None:
+            self.on_finished(self.fileName if commit else None)
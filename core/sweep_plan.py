@@ -0,0 +1,95 @@
+import os
+import json
+import logging
+import itertools
+from collections import namedtuple
+
+# Plans automated sweeps over boards, camera settings and turntable angles.
+#
+#   config:                  camera properties, values in percent
+#     CAP_PROP_BRIGHTNESS: {start: 0, end: 100, step: 10}
+#   mode: separate           one property at a time with the others at
+#                            `neutral`, or `product` for every combination
+#   boards: [board10_4]      mounted by hand, so they are the outermost loop
+#   angles: [0, 45, ...]
+#
+# Every cell is one recording. Within a board the camera settings are visited
+# in order, changing as few properties as possible from one to the next, and
+# the angles are run forth and back (serpentine) so that the turntable never
+# returns to the start between settings.
+
+SweepCell = namedtuple('SweepCell', ['board', 'settings', 'angle', 'path'])
+
+NEUTRAL = 50.5
+
+def property_values(spec):
+    return list(range(spec['start'], spec['end'] + 1, spec['step']))
+
+def camera_settings(config):
+    # [(settings, directory)], settings being ((property, value), ...)
+    properties = sorted(config['config'])
+    neutral = config.get('neutral', NEUTRAL)
+    if config.get('mode', 'separate') == 'product':
+        product = itertools.product(*[property_values(config['config'][prop]) for prop in properties])
+        return [(tuple(zip(properties, values)), ('product', '_'.join(str(v) for v in values)))
+                for values in product]
+
+    settings = []
+    for prop in properties:
+        for value in property_values(config['config'][prop]):
+            values = tuple((other, value if other == prop else neutral) for other in properties)
+            settings.append((values, (prop, str(value))))
+    return settings
+
+def plan_sweep(config, default_board=None):
+    boards = config.get('boards') or [default_board]
+    angles = list(config['angles'])
+    cells = []
+    for board in boards:
+        for settings, (series, value) in camera_settings(config):
+            # continue from the angle the previous setting ended on
+            ordered = angles if (len(cells) // max(len(angles), 1)) % 2 == 0 else angles[::-1]
+            for angle in ordered:
+                # same layout as tester_gui/test/evaluate.py: property/board/value/angle
+                path = os.path.join(series, str(board), value, str(angle))
+                cells.append(SweepCell(board, settings, angle, path))
+    return cells
+
+def plan_signature(config, default_board=None):
+    keys = ('config', 'mode', 'neutral', 'boards', 'angles')
+    signature = dict((key, config.get(key)) for key in keys)
+    signature['default_board'] = default_board
+    return json.dumps(signature, sort_keys=True)
+
+class Checkpoint(object):
+    # Paths of the completed cells of a plan, rewritten as a whole after every
+    # cell so that an interrupted run resumes where it stopped. A checkpoint of
+    # a different plan is discarded.
+
+    def __init__(self, fileName, signature):
+        self.logger = logging.getLogger('aruco_analyzer.gui.sweep_plan')
+        self.fileName = fileName
+        self.signature = signature
+        self.done = set()
+        if os.path.exists(fileName):
+            try:
+                with open(fileName) as file:
+                    state = json.load(file)
+            except (IOError, ValueError) as e:
+                self.logger.warning('Ignoring unreadable checkpoint {}: {}'.format(fileName, e))
+                return
+            if state.get('signature') == signature:
+                self.done = set(state.get('done', []))
+                self.logger.info('Resuming sweep, {} cells already done'.format(len(self.done)))
+            else:
+                self.logger.warning('Checkpoint {} belongs to another plan, starting over'.format(fileName))
+
+    def remaining(self, cells):
+        return [cell for cell in cells if cell.path not in self.done]
+
+    def mark(self, path):
+        self.done.add(path)
+        temp_name = self.fileName + '.part'
+        with open(temp_name, 'w') as file:
+            json.dump({'signature': self.signature, 'done': sorted(self.done)}, file)
+        os.rename(temp_name, self.fileName)
@@ -0,0 +1,100 @@
+import os
+import logging
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import numpy as np
+
+from core import recording_format
+from core.online_stats import RecordingStats, average_quaternion, attitude_std
+
+SUMMARY_HEADER = 'file,count,x,y,z,std_x,std_y,std_z,qw,qx,qy,qz,attitude_std'
+
+def recording_stats(fileName, samples):
+    # the statistics PoseStats keeps while recording, computed from the samples
+    if len(samples) == 0:
+        return RecordingStats(fileName, 0, None, None, None, None)
+    positions = samples['position']
+    quaternions = np.array(samples['quaternion'], dtype=float)
+    quaternions *= np.where(quaternions.dot(quaternions[0]) < 0, -1., 1.)[:, np.newaxis]
+    covariance = np.cov(quaternions.T) if len(samples) > 1 else np.zeros((4, 4))
+    return RecordingStats(fileName, len(samples), positions.mean(axis=0),
+                          positions.std(axis=0, ddof=1) if len(samples) > 1 else np.zeros(3),
+                          average_quaternion(quaternions.T.dot(quaternions)), attitude_std(covariance))
+
+def append_summary(summary_name, stats):
+    # one CSV line per recording, the header is written with the first one
+    if stats.count == 0:
+        return
+    new = not os.path.exists(summary_name)
+    with open(summary_name, 'a') as file:
+        if new:
+            file.write(SUMMARY_HEADER + '\n')
+        values = np.concatenate(([stats.count], stats.position, stats.position_std, stats.quaternion,
+                                 [stats.attitude_std]))
+        name = os.path.relpath(stats.fileName, os.path.dirname(os.path.realpath(summary_name)))
+        file.write(','.join([name] + ['%.15g' % v for v in values]) + '\n')
+
+class SweepWriter(object):
+    # Write-behind saving of the recordings of a sweep. save() queues a
+    # recording and returns, so the turntable moves on to the next angle while
+    # the last one is written and evaluated. Only when `max_pending`
+    # recordings are waiting does save() block. The statistics of every
+    # recording are appended to `summary`, if given. on_saved(stats) runs on
+    # the writer thread.
+
+    def __init__(self, max_pending=4, on_saved=None, summary=None):
+        self.logger = logging.getLogger('aruco_analyzer.gui.sweep_writer')
+        self.on_saved = on_saved
+        self.summary = summary
+        self.stats = []
+        self.failed = []
+
+        self.queue = queue.Queue(max_pending)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def save(self, fileName, samples, stats=None):
+        # `samples` must not be modified afterwards, see PoseBroadcaster.takeRecording.
+        # `stats` kept while recording spare the writer computing them.
+        self.queue.put((fileName, samples, stats))
+
+    def close(self):
+        # waits until everything queued is on disk
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            fileName, samples, stats = item
+            dir_path = os.path.dirname(os.path.realpath(fileName))
+            try:
+                if not os.path.isdir(dir_path):
+                    os.makedirs(dir_path)
+                recording_format.save(fileName, samples)
+            except (IOError, OSError) as e:
+                self.logger.error('Failed to save {}: {}'.format(fileName, e))
+                self.failed.append(fileName)
+                continue
+            if stats is None:
+                stats = recording_stats(fileName, samples)
+            else:
+                stats = stats._replace(fileName=fileName)
+            self.stats.append(stats)
+            if self.summary is not None:
+                try:
+                    append_summary(self.summary, stats)
+                except (IOError, OSError) as e:
+                    self.logger.error('Failed to write summary {}: {}'.format(self.summary, e))
+            if stats.count > 0:
+                self.logger.info('{}: {} samples, position {} +- {}'.format(
+                    fileName, stats.count, np.round(stats.position, 4), np.round(stats.position_std, 4)))
+            if self.on_saved is not None:
+                self.on_saved(stats)
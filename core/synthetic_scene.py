@@ -0,0 +1,326 @@
+import os
+import time
+import math
+import atexit
+
+import numpy as np
+import cv2
+
+from core import pose
+from core import recording_format
+from core.recording_buffer import RecordingBuffer
+from core.video_source import VideoCaptureBase, capture_image_miner
+from core.virtual_acs import shared_turntable
+
+# Renders ArUco boards at scripted poses as camera frames. Board frames follow
+# the classic OpenCV grid board convention: origin at the bottom left corner
+# of the marker area, x right, y up and z out of the board towards the viewer.
+# The camera frame is OpenCV's, x right, y down, z forward.
+
+# attitude of a board standing upright and facing the camera
+FACING_CAMERA = pose.from_axis_angle([1., 0., 0.], math.pi)
+
+# outward normals of the faces of a cube as rotations of a board's z axis,
+# the four lateral faces first
+CUBE_FACES = (
+    pose.from_axis_angle([0., 1., 0.], 0.),
+    pose.from_axis_angle([0., 1., 0.], math.pi / 2),
+    pose.from_axis_angle([0., 1., 0.], math.pi),
+    pose.from_axis_angle([0., 1., 0.], -math.pi / 2),
+    pose.from_axis_angle([1., 0., 0.], -math.pi / 2),
+    pose.from_axis_angle([1., 0., 0.], math.pi / 2),
+)
+
+MAX_FACE_PIXELS = 2048
+
+# share of its unobstructed area a board must show to count as visible in the
+# ground truth
+MIN_VISIBLE_FRACTION = 0.5
+
+# free space between boards placed side by side, meters
+BOARD_GAP = 0.02
+
+def get_dictionary(name):
+    return cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, name))
+
+def draw_grid(dictionary, x, y, marker_length, separation, first_marker, size, margin):
+    if hasattr(cv2.aruco, 'GridBoard_create'):
+        board = cv2.aruco.GridBoard_create(x, y, marker_length, separation, dictionary, first_marker)
+        return board.draw(size, marginSize=margin, borderBits=1)
+    ids = np.arange(first_marker, first_marker + x * y, dtype=np.int32)
+    board = cv2.aruco.GridBoard((x, y), marker_length, separation, dictionary, ids)
+    return board.generateImage(size, marginSize=margin, borderBits=1)
+
+class Face(object):
+    # A planar grid of markers drawn once with a white `margin` around it.
+    # `corners` are the object frame positions of the image corners.
+
+    def __init__(self, dictionary, x, y, marker_length, separation, first_marker, margin,
+                 rotation=None, offset=None):
+        self.width = x * marker_length + (x - 1) * separation
+        self.height = y * marker_length + (y - 1) * separation
+        pixels_per_meter = min(100. / marker_length,
+                               MAX_FACE_PIXELS / (max(self.width, self.height) + 2 * margin))
+        size = (int(round((self.width + 2 * margin) * pixels_per_meter)),
+                int(round((self.height + 2 * margin) * pixels_per_meter)))
+        image = draw_grid(dictionary, x, y, marker_length, separation, first_marker, size,
+                          int(round(margin * pixels_per_meter)))
+        self.image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        self.pixels = np.float32([[0, 0], [size[0], 0], [size[0], size[1]], [0, size[1]]])
+
+        corners = np.array([
+            [-margin, self.height + margin, 0.],
+            [self.width + margin, self.height + margin, 0.],
+            [self.width + margin, -margin, 0.],
+            [-margin, -margin, 0.]])
+        if rotation is None:
+            rotation = pose.from_axis_angle([0., 0., 1.], 0.)
+        if offset is None:
+            offset = np.zeros(3)
+        self.corners = pose.rotate(rotation, corners) + offset
+        self.normal = pose.rotate(rotation, [0., 0., 1.])
+
+class Board(object):
+    # A rigid set of faces. `center` is the object frame point that is put on
+    # the turntable axis, `label` the id its ground truth is recorded under.
+
+    def __init__(self, label, faces, center):
+        self.label = label
+        self.faces = faces
+        self.center = np.asarray(center, dtype=float)
+
+    @property
+    def radius(self):
+        # of the smallest sphere about the center holding every face
+        return max(np.linalg.norm(face.corners - self.center, axis=1).max() for face in self.faces)
+
+def grid_board(label, dictionary, x, y, marker_length, separation, first_marker, margin):
+    face = Face(get_dictionary(dictionary), x, y, marker_length, separation, first_marker, margin)
+    return Board(label, [face], [face.width / 2., face.height / 2., 0.])
+
+def cube_board(label, dictionary, marker_per_side, marker_length, border, first_marker, face_count=6):
+    # one marker_per_side x marker_per_side grid on each face, separated and
+    # surrounded by `border`, ids counting up face by face. A satellite only
+    # carries markers on its four lateral faces (in config.yaml its 36 ids
+    # end right before the grid starting at 37).
+    dictionary = get_dictionary(dictionary)
+    n = marker_per_side
+    inner = n * marker_length + (n - 1) * border
+    side = inner + 2 * border
+    faces = []
+    for i, rotation in enumerate(CUBE_FACES[:face_count]):
+        normal = pose.rotate(rotation, [0., 0., 1.])
+        offset = normal * side / 2. - pose.rotate(rotation, [inner / 2., inner / 2., 0.])
+        faces.append(Face(dictionary, n, n, marker_length, border, first_marker + i * n * n, border,
+                          rotation, offset))
+    return Board(label, faces, np.zeros(3))
+
+def make_board(definition, dictionary='DICT_4X4_50'):
+    # accepts the board_config entries of config.yaml as well as the boards
+    # table of the tester (board_marker_size, board_x, board_y, board_margin_size)
+    if 'board_x' in definition:
+        return grid_board(definition.get('label', 'B000'), definition.get('dictionary', dictionary),
+                          definition['board_x'], definition['board_y'], definition['board_marker_size'],
+                          definition['board_margin_size'], definition.get('first_marker', 0),
+                          definition.get('margin', definition['board_marker_size'] / 2.))
+
+    kind = definition.get('type', 'grid')
+    first_marker = definition.get('first_marker', 0)
+    label = definition.get('label', '{}{:03d}'.format(kind[0].upper(), first_marker))
+    dictionary = definition.get('dictionary', dictionary)
+    if kind == 'grid':
+        return grid_board(label, dictionary, definition['x'], definition['y'], definition['marker_length'],
+                          definition['separation'], first_marker,
+                          definition.get('margin', definition['marker_length'] / 2.))
+    if kind in ('cube', 'satellite'):
+        return cube_board(label, dictionary, definition['marker_per_side'], definition['marker_length'],
+                          definition['border'], first_marker, 4 if kind == 'satellite' else 6)
+    raise ValueError('unknown board type {}'.format(kind))
+
+class TurntableSweep(object):
+    # Boards on a turntable `distance` in front of the camera, facing it at
+    # angle 0. The table dwells `dwell` seconds at each of `angles` (degrees)
+    # and starts over, or turns continuously at `rate` degrees per second.
+    # With `virtual` set it follows the simulated drive of core/virtual_acs.py
+    # in real time instead, so that sweeps driven through the 'virtual' ACS
+    # port move the boards. `offsets` place the boards on the table, {label:
+    # (x, y, z)} in table coordinates, which are the camera's at angle 0.
+    # Without them synthetic_capture lines several boards up side by side
+    # along x, see default_offsets.
+
+    def __init__(self, distance=0.5, angles=(0, 45, 90, 135, 180, 225, 270, 315), dwell=2., rate=None,
+                 axis=(0., -1., 0.), offsets=None, virtual=False):
+        self.distance = distance
+        self.angles = list(angles)
+        self.dwell = dwell
+        self.rate = rate
+        self.axis = axis
+        self.offsets = offsets or {}
+        self.turntable = shared_turntable() if virtual else None
+
+    def angle(self, t):
+        if self.turntable is not None:
+            return self.turntable.angle
+        if self.rate is not None:
+            return (t * self.rate) % 360.
+        return self.angles[int(t / self.dwell) % len(self.angles)]
+
+    def pose(self, t, board):
+        table = pose.from_axis_angle(self.axis, math.radians(self.angle(t)))
+        quaternion = pose.multiply(table, FACING_CAMERA)
+        offset = np.asarray(self.offsets.get(board.label, (0., 0., 0.)), dtype=float)
+        position = (np.array([0., 0., self.distance]) + pose.rotate(table, offset)
+                    - pose.rotate(quaternion, board.center))
+        return position, quaternion
+
+class SyntheticVideoCapture(VideoCaptureBase):
+    # Frames of `boards` moved by `sweep`, rendered by a pinhole camera
+    # without distortion. Scene time advances by 1/fps per frame (1/30 when
+    # unthrottled), so a run renders the same frames however fast it is read.
+    # The pose of every board that faces the camera and is not mostly hidden
+    # behind other boards is recorded as ground truth, stamped like a
+    # capture, and written to `ground_truth` on release and at exit.
+
+    def __init__(self, boards, sweep, width=1280, height=720, fps=30, fov=60., camera_matrix=None,
+                 noise=0., background=128, ground_truth=None):
+        super(SyntheticVideoCapture, self).__init__(fps)
+        self.boards = boards
+        self.sweep = sweep
+        self.width = width
+        self.height = height
+        if camera_matrix is None:
+            focal = width / 2. / math.tan(math.radians(fov) / 2.)
+            camera_matrix = [[focal, 0., width / 2.], [0., focal, height / 2.], [0., 0., 1.]]
+        self.camera_matrix = np.array(camera_matrix, dtype=float)
+        self.noise = noise
+        self.background = np.full((height, width, 3), background, dtype=np.uint8)
+        self.noise_buffer = np.empty((height, width, 3), dtype=np.int16)
+        self.ground_truth = ground_truth
+        if ground_truth is not None:
+            atexit.register(self.save_ground_truth)
+        self.truth = RecordingBuffer()
+        self.last_truth = []
+        self.index = 0
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        if self.opened:
+            self.opened = False
+            self.save_ground_truth()
+
+    def save_ground_truth(self):
+        if self.ground_truth is None or len(self.truth) == 0:
+            return
+        dir_path = os.path.dirname(os.path.realpath(self.ground_truth))
+        if not os.path.isdir(dir_path):
+            os.makedirs(dir_path)
+        recording_format.save(self.ground_truth, self.truth.samples)
+        self.logger.info('{} ground truth poses written to {}'.format(len(self.truth), self.ground_truth))
+
+    def project(self, points):
+        projected = points.dot(self.camera_matrix.T)
+        return np.float32(projected[:, :2] / projected[:, 2:])
+
+    def next_image(self):
+        t = self.index / float(self.fps if self.fps > 0 else 30.)
+        self.index += 1
+        timestamp = time.time()
+        frame = self.background.copy()
+
+        faces = []
+        placed = []
+        for index, board in enumerate(self.boards):
+            position, quaternion = self.sweep.pose(t, board)
+            front = False
+            for face in board.faces:
+                corners = pose.rotate(quaternion, face.corners) + position
+                if np.any(corners[:, 2] < 0.01):
+                    continue
+                # back faces are hidden
+                if np.dot(pose.rotate(quaternion, face.normal), corners.mean(axis=0)) >= 0:
+                    continue
+                faces.append((corners[:, 2].mean(), index, face, corners))
+                front = True
+            if front:
+                placed.append((index, board, position, quaternion))
+        # far faces first so that near ones cover them
+        faces.sort(key=lambda item: -item[0])
+
+        self.last_truth = []
+        visible = self.visible_boards(faces) if len(placed) > 1 else set(index for index, _, _, _ in placed)
+        for index, board, position, quaternion in placed:
+            if index in visible:
+                self.truth.append(board.label, timestamp, position, quaternion)
+                self.last_truth.append((board.label, position, quaternion))
+
+        for _, _, face, corners in faces:
+            homography = cv2.getPerspectiveTransform(face.pixels, self.project(corners))
+            cv2.warpPerspective(face.image, homography, (self.width, self.height), dst=frame,
+                                flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_TRANSPARENT)
+
+        if self.noise > 0:
+            cv2.randn(self.noise_buffer, 0, self.noise)
+            frame = cv2.add(frame, self.noise_buffer, dtype=cv2.CV_8U)
+        return frame
+
+    def visible_boards(self, faces):
+        # indices of the boards that show at least MIN_VISIBLE_FRACTION of
+        # their area with the other boards in front of them, `faces` far first
+        owner = np.full((self.height, self.width), -1, dtype=np.int32)
+        mask = np.zeros((self.height, self.width), dtype=np.uint8)
+        polygons = [(index, np.int32(np.round(self.project(corners)))) for _, index, _, corners in faces]
+        for index, polygon in polygons:
+            cv2.fillConvexPoly(owner, polygon, index)
+        shown = np.bincount(owner.ravel() + 1, minlength=len(self.boards) + 1)[1:]
+        visible = set()
+        for index in set(index for index, _ in polygons):
+            mask[:] = 0
+            for other, polygon in polygons:
+                if other == index:
+                    cv2.fillConvexPoly(mask, polygon, 1)
+            area = cv2.countNonZero(mask)
+            if area > 0 and shown[index] >= MIN_VISIBLE_FRACTION * area:
+                visible.add(index)
+        return visible
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.index
+        return super(SyntheticVideoCapture, self).get(prop)
+
+def default_offsets(boards, gap=BOARD_GAP):
+    # boards side by side along the table's x axis, centered on the turntable
+    # axis and `gap` apart, so that none of them sits inside another
+    offsets = {}
+    x = 0.
+    for board in boards:
+        x += board.radius
+        offsets[board.label] = (x, 0., 0.)
+        x += board.radius + gap
+    middle = (x - gap) / 2.
+    return dict((label, (offset[0] - middle, 0., 0.)) for label, offset in offsets.items())
+
+def synthetic_capture(scene, board_config=(), base_dir=''):
+    # gui: image_source: synthetic: {...}, boards default to the board_config
+    # of config.yaml
+    dictionary = scene.get('dictionary', 'DICT_4X4_50')
+    boards = [make_board(definition, dictionary) for definition in scene.get('boards', board_config)]
+    sweep = TurntableSweep(**scene.get('sweep', {}))
+    if not sweep.offsets and len(boards) > 1:
+        sweep.offsets = default_offsets(boards)
+    ground_truth = scene.get('ground_truth')
+    if ground_truth is not None:
+        ground_truth = os.path.join(base_dir, ground_truth)
+    return SyntheticVideoCapture(boards, sweep, scene.get('width', 1280), scene.get('height', 720),
+                                 scene.get('fps', 30), scene.get('fov', 60.), scene.get('camera_matrix'),
+                                 scene.get('noise', 0.), scene.get('background', 128), ground_truth)
+
+def synthetic_image_miner(miner_class, scene, board_config=(), base_dir=''):
+    return capture_image_miner(miner_class, lambda: synthetic_capture(scene, board_config, base_dir), 'Synthetic')
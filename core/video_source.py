@@ -0,0 +1,207 @@
+import os
+import abc
+import time
+import logging
+import threading
+
+import cv2
+
+from core.latency import monotonic
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+class VideoCaptureBase(abc.ABCMeta('ABC', (object,), {})):
+    # The part of the cv2.VideoCapture interface the image miners use, for
+    # captures that produce their frames in Python. Subclasses implement
+    # isOpened() and next_image(). Frames are handed out at `fps`, 0 runs as
+    # fast as they are read. Brightness and contrast are emulated on the
+    # frames so that property sweeps still change the input, all other
+    # properties are only stored.
+
+    def __init__(self, fps=0):
+        self.logger = logging.getLogger('aruco_analyzer.gui.video_source')
+        self.fps = fps
+        self.properties = {}
+        self.frames_read = 0
+        self.started = None
+        self.next_frame = None
+        self.lock = threading.Lock()
+
+    @abc.abstractmethod
+    def isOpened(self):
+        pass
+
+    @abc.abstractmethod
+    def next_image(self):
+        pass
+
+    def release(self):
+        pass
+
+    def wait_for_frame(self):
+        now = monotonic()
+        if self.started is None:
+            self.started = now
+            self.next_frame = now
+        if self.fps > 0:
+            if self.next_frame > now:
+                time.sleep(self.next_frame - now)
+            # a slow reader skips ahead instead of bursting to catch up
+            self.next_frame = max(self.next_frame, now - 1. / self.fps) + 1. / self.fps
+
+    def read(self, image=None):
+        with self.lock:
+            if not self.isOpened():
+                return False, None
+            self.wait_for_frame()
+            frame = self.next_image()
+            if frame is None:
+                return False, None
+            self.frames_read += 1
+            return True, self.adjust(frame)
+
+    def grab(self):
+        return self.isOpened()
+
+    def retrieve(self, image=None, flag=None):
+        return self.read()
+
+    def adjust(self, frame):
+        brightness = self.properties.get(cv2.CAP_PROP_BRIGHTNESS)
+        contrast = self.properties.get(cv2.CAP_PROP_CONTRAST)
+        if brightness is None and contrast is None:
+            return frame.copy()
+        # values in [0, 1] like the tester's sweeps, 0.5 leaves the frame unchanged
+        alpha = 2. * contrast if contrast is not None else 1.
+        beta = (brightness - 0.5) * 255 if brightness is not None else 0.
+        return cv2.convertScaleAbs(frame, alpha=alpha, beta=beta)
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FPS:
+            self.fps = value
+        self.properties[prop] = value
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return self.properties.get(prop, 0)
+
+    def measured_fps(self):
+        if self.started is None or self.frames_read < 2:
+            return 0
+        return self.frames_read / (monotonic() - self.started)
+
+class FileVideoCapture(VideoCaptureBase):
+    # Frames from a video file or a directory of images, started over at the
+    # end if `loop` is set. fps None keeps the rate of the video. Image
+    # directories are decoded once up front so that disk and codec time stay
+    # out of the measurement.
+
+    def __init__(self, path, fps=0, loop=True):
+        super(FileVideoCapture, self).__init__(fps)
+        self.path = path
+        self.loop = loop
+
+        self.video = None
+        self.images = None
+        self.index = 0
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+            self.images = [cv2.imread(os.path.join(path, name)) for name in names]
+            self.images = [image for image in self.images if image is not None]
+            recorded_fps = 0
+        else:
+            self.video = cv2.VideoCapture(path)
+            recorded_fps = self.video.get(cv2.CAP_PROP_FPS) if self.video.isOpened() else 0
+        self.fps = fps if fps is not None else recorded_fps
+        if not self.isOpened():
+            self.logger.error('No frames in {}'.format(path))
+
+    def isOpened(self):
+        if self.images is not None:
+            return len(self.images) > 0
+        return self.video is not None and self.video.isOpened()
+
+    def release(self):
+        if self.video is not None:
+            self.video.release()
+        self.images = None
+        self.video = None
+
+    def next_image(self):
+        if self.images is not None:
+            if self.index >= len(self.images):
+                if not self.loop:
+                    return None
+                self.index = 0
+            image = self.images[self.index]
+            self.index += 1
+            return image
+
+        ok, image = self.video.read()
+        if not ok and self.loop:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, image = self.video.read()
+        return image if ok else None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            if self.images is not None:
+                return len(self.images)
+            return self.video.get(prop) if self.video is not None else 0
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT):
+            if self.images:
+                height, width = self.images[0].shape[:2]
+                return width if prop == cv2.CAP_PROP_FRAME_WIDTH else height
+            if self.video is not None:
+                return self.video.get(prop)
+        return super(FileVideoCapture, self).get(prop)
+
+def capture_image_miner(miner_class, open_capture, name):
+    # aruco_analyzer's miners open their camera as a cv2.VideoCapture when
+    # they are created. The returned subclass releases every capture its base
+    # opened and reads from `open_capture()` instead, other miners and the
+    # library itself are left alone. Captures handed out are kept in
+    # `captures`.
+    captures = []
+
+    def __init__(self, *args, **kwargs):
+        miner_class.__init__(self, *args, **kwargs)
+        replaced = False
+        for attribute, value in list(vars(self).items()):
+            if isinstance(value, cv2.VideoCapture):
+                value.release()
+                capture = open_capture()
+                captures.append(capture)
+                setattr(self, attribute, capture)
+                replaced = True
+        if not replaced:
+            raise TypeError('{} did not open a cv2.VideoCapture'.format(miner_class.__name__))
+
+    return type(name + miner_class.__name__, (miner_class,), {'__init__': __init__, 'captures': captures})
+
+def tracked_image_miner(miner_class):
+    # the detector creates its miners itself, the returned subclass keeps them
+    # in `instances` so that their cameras can still be reached
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        miner_class.__init__(self, *args, **kwargs)
+        instances.append(self)
+
+    return type(miner_class.__name__, (miner_class,), {'__init__': __init__, 'instances': instances})
+
+def file_image_miner(miner_class, path, fps=0, loop=True):
+    return capture_image_miner(miner_class, lambda: FileVideoCapture(path, fps, loop), 'File')
+
+def image_miner_for(miner_class, source_config, base_dir='', config=None):
+    # gui: image_source: {path, fps, loop} or {synthetic: {...}}, None keeps the camera
+    if not source_config:
+        return miner_class
+    if 'synthetic' in source_config:
+        from core.synthetic_scene import synthetic_image_miner
+        board_config = (config or {}).get('board_config', [])
+        return synthetic_image_miner(miner_class, source_config['synthetic'], board_config, base_dir)
+    path = os.path.join(base_dir, source_config['path'])
+    return file_image_miner(miner_class, path, source_config.get('fps', 0), source_config.get('loop', True))
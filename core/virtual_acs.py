@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+import os
+import sys
+import math
+import logging
+import argparse
+import threading
+
+from core.latency import monotonic
+
+# Simulated ACS turntable drive for running sweeps without the rig. It speaks
+# the ASCII protocol ACSController sends, one command per line:
+#
+#   SH, MO     motor on, motor off
+#   ST         stop (decelerates)
+#   SPn, ACn   speed (counts/s) and acceleration (counts/s^2)
+#   PAn, BG    absolute target (counts), begin motion
+#   PX, VX     actual position and velocity (counts, counts/s)
+#   MS         motion status: 0 stopped, 1 settling, 2 moving, 3 motor off
+#   SO         motor on (1) or off (0)
+#
+# SP, AC and PA without a value are queries as well. Every command is
+# answered by a line: the value followed by ';' for queries, the echoed
+# command followed by ';' otherwise, and '?;' for anything unknown.
+
+COUNTS_PER_DEGREE = 10000
+VIRTUAL_PORT = 'virtual'
+
+class VirtualTurntable(object):
+    # Trapezoidal motion profile, integrated lazily up to the time of every
+    # command or query.
+
+    STEP = 0.001
+
+    def __init__(self, speed=100000, acceleration=200000, settle_time=0.05):
+        self.lock = threading.Lock()
+        self.speed = float(speed)
+        self.acceleration = float(acceleration)
+        self.settle_time = settle_time
+        self.position = 0.
+        self.velocity = 0.
+        self.target = 0.
+        self.motor_on = False
+        self.moving = False
+        self.stopping = False
+        self.settled_at = 0.
+        self.last_update = monotonic()
+
+    @property
+    def angle(self):
+        # degrees, for observers like the synthetic camera
+        with self.lock:
+            self.update()
+            return self.position / COUNTS_PER_DEGREE
+
+    def update(self):
+        now = monotonic()
+        elapsed = now - self.last_update
+        self.last_update = now
+        while self.moving and elapsed > 0:
+            dt = min(self.STEP, elapsed)
+            elapsed -= dt
+            self.step(dt, now - elapsed)
+
+    def step(self, dt, now):
+        a = self.acceleration
+        if self.stopping:
+            remaining = -self.velocity
+        else:
+            remaining = self.target - self.position
+        braking = self.velocity * self.velocity / (2 * a)
+        direction = math.copysign(1., remaining)
+
+        if self.stopping or (abs(remaining) <= braking + abs(self.velocity) * dt and self.velocity * direction > 0):
+            # decelerate towards zero velocity
+            change = min(a * dt, abs(self.velocity))
+            self.velocity -= math.copysign(change, self.velocity)
+        else:
+            self.velocity = max(-self.speed, min(self.speed, self.velocity + direction * a * dt))
+        self.position += self.velocity * dt
+
+        if self.stopping:
+            if self.velocity == 0:
+                self.finish(now)
+        elif (self.target - self.position) * remaining <= 0 or abs(self.target - self.position) < 1:
+            # arrived, or crossed the target within the last step while braking
+            self.position = self.target
+            self.finish(now)
+
+    def finish(self, now):
+        self.velocity = 0.
+        self.moving = False
+        self.stopping = False
+        self.settled_at = now + self.settle_time
+
+    def status(self):
+        if not self.motor_on:
+            return 3
+        if self.moving:
+            return 2
+        return 1 if monotonic() < self.settled_at else 0
+
+    def command(self, line):
+        line = line.strip().upper()
+        name, value = line[:2], line[2:]
+        with self.lock:
+            self.update()
+            if name in ('SH', 'MO', 'ST', 'BG') and value == '':
+                return self.action(name)
+            if name in ('SP', 'AC', 'PA'):
+                if value == '':
+                    return self.format({'SP': self.speed, 'AC': self.acceleration, 'PA': self.target}[name])
+                try:
+                    number = float(value)
+                except ValueError:
+                    return '?;'
+                if name == 'SP':
+                    self.speed = abs(number)
+                elif name == 'AC':
+                    self.acceleration = abs(number)
+                else:
+                    self.target = number
+                return line + ';'
+            if value == '':
+                if name == 'PX':
+                    return self.format(self.position)
+                if name == 'VX':
+                    return self.format(self.velocity)
+                if name == 'MS':
+                    return '{};'.format(self.status())
+                if name == 'SO':
+                    return '{};'.format(int(self.motor_on))
+            return '?;'
+
+    def action(self, name):
+        if name == 'SH':
+            self.motor_on = True
+        elif name == 'MO':
+            self.motor_on = False
+            self.moving = False
+            self.stopping = False
+            self.velocity = 0.
+        elif name == 'ST':
+            if self.moving:
+                self.stopping = True
+        elif name == 'BG':
+            if not self.motor_on:
+                return '?;'
+            self.moving = True
+            self.stopping = False
+        return name + ';'
+
+    def format(self, value):
+        return '{};'.format(int(round(value)))
+
+class VirtualSerial(object):
+    # The part of serial.Serial that ACSController uses, answered in process
+    # by a VirtualTurntable.
+
+    BUFFER_SIZE = 4096
+
+    def __init__(self, turntable=None, timeout=None):
+        self.turntable = turntable if turntable is not None else shared_turntable()
+        self.timeout = timeout
+        self.port = VIRTUAL_PORT
+        self.is_open = False
+        self.condition = threading.Condition()
+        self.pending = b''
+        self.output = b''
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    @property
+    def in_waiting(self):
+        with self.condition:
+            return len(self.output)
+
+    def reset_input_buffer(self):
+        with self.condition:
+            self.output = b''
+
+    def write(self, data):
+        with self.condition:
+            self.pending += data
+            while b'\n' in self.pending:
+                line, self.pending = self.pending.split(b'\n', 1)
+                line = line.decode('UTF-8').strip()
+                if line:
+                    self.output += (self.turntable.command(line) + '\r\n').encode('UTF-8')
+            # like a device buffer nobody reads, the oldest answers are lost
+            if len(self.output) > self.BUFFER_SIZE:
+                self.output = self.output[self.output.index(b'\n', len(self.output) - self.BUFFER_SIZE) + 1:]
+            self.condition.notify_all()
+        return len(data)
+
+    def readline(self):
+        with self.condition:
+            deadline = None if self.timeout is None else monotonic() + self.timeout
+            while b'\n' not in self.output:
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    data, self.output = self.output, b''
+                    return data
+                self.condition.wait(remaining)
+            line, self.output = self.output.split(b'\n', 1)
+            return line + b'\n'
+
+turntable = None
+turntable_lock = threading.Lock()
+
+def shared_turntable():
+    # the drive behind the 'virtual' port, shared with the synthetic camera
+    global turntable
+    with turntable_lock:
+        if turntable is None:
+            turntable = VirtualTurntable()
+        return turntable
+
+class PtyServer(object):
+    # Serves a VirtualTurntable on a pseudo terminal, linked to `link`, so
+    # that a real serial.Serial in another process can open it.
+
+    def __init__(self, link, turntable=None):
+        import pty
+        import tty
+        self.logger = logging.getLogger('aruco_analyzer.gui.virtual_acs')
+        self.turntable = turntable if turntable is not None else shared_turntable()
+        self.master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.slave_name = os.ttyname(slave)
+        self.slave = slave
+        self.link = link
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(self.slave_name, link)
+        self.logger.info('Virtual ACS drive on {} ({})'.format(link, self.slave_name))
+
+    def serve_forever(self):
+        pending = b''
+        try:
+            while True:
+                data = os.read(self.master, 1024)
+                if not data:
+                    break
+                pending += data
+                while b'\n' in pending:
+                    line, pending = pending.split(b'\n', 1)
+                    line = line.decode('UTF-8').strip()
+                    if line:
+                        os.write(self.master, (self.turntable.command(line) + '\r\n').encode('UTF-8'))
+        except OSError:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if os.path.islink(self.link) and os.readlink(self.link) == self.slave_name:
+            os.remove(self.link)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a simulated ACS turntable drive on a pseudo terminal.')
+    parser.add_argument('link', nargs='?', default='/tmp/ttyACS0', help='path of the port to create (default: /tmp/ttyACS0)')
+    parser.add_argument('--speed', type=float, default=100000, help='initial speed in counts/s')
+    parser.add_argument('--acceleration', type=float, default=200000, help='acceleration in counts/s^2')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = PtyServer(args.link, VirtualTurntable(args.speed, args.acceleration))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
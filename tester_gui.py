@@ -1,5 +1,10 @@
 import os
 import sys
+from yaml import load
+try:
+    from yaml import CLoader as Loader
+except ImportError:
+    from yaml import Loader
 
 from PySide2.QtUiTools import QUiLoader
 from PySide2.QtWidgets import QApplication
@@ -22,8 +27,11 @@ class Form(QObject):
         loader = QUiLoader()
         self.window = loader.load(ui_file)
         ui_file.close()
+
+        config = load(open(os.path.join(base_dir, 'config', 'config.yaml')), Loader=Loader)
+        gui_config = config.get('gui', {})
   
-        acsControlWidget = ACSControlWidget(self.window)
+        acsControlWidget = ACSControlWidget(self.window, gui_config.get('acs_feedback', False))
         self.window.gridLayout.addWidget(acsControlWidget)
 
         arucoTesterWidget = ArUcoTesterWidget(ARMarkerDetector, OpenCVImageMiner, self.window)
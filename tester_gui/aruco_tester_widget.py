@@ -1,9 +1,8 @@
 import os
 import sys
 import time
-import threading
-from PySide2.QtWidgets import QWidget, QFileDialog
-from PySide2.QtCore import Signal, Slot, QFile, QSaveFile, QTextStream, QObject, QTimer, QDir
+from PySide2.QtWidgets import QApplication, QWidget, QFileDialog
+from PySide2.QtCore import Signal, Slot, QFile, QObject
 from PySide2.QtUiTools import QUiLoader
 from yaml import load
 try:
@@ -11,7 +10,10 @@ try:
 except ImportError:
     from yaml import Loader
 
-import cv2
+from core.pose_broadcaster import PoseBroadcaster
+from core.frame_mailbox import FrameMailbox
+from core.video_source import image_miner_for, tracked_image_miner
+from adcs_gui.image_view_frame import ImageViewFrame
 
 # boards = {
 #     'board2': {'board_marker_size': 0.0485, 'board_x': 2, 'board_y': 2},
@@ -55,14 +57,24 @@ class ArUcoTesterWidget(QWidget):
         
         board = boards[self.use_board]
         config_dir = os.path.join(base_dir, '..', 'config', 'config.yaml')
-        self.aruco_detector = detector_module(load(open(config_dir), Loader=Loader))
-        self.image_miner_module = image_miner_module
+        config = load(open(config_dir), Loader=Loader)
+        self.aruco_detector = detector_module(config)
+        self.image_miner_module = tracked_image_miner(image_miner_for(
+            image_miner_module, config.get('gui', {}).get('image_source'), os.path.join(base_dir, '..'), config))
         self.aruco_detector.set_image_miner(self.image_miner_module)
         self.aruco_detector.launch_detection_workers()
 
         self.broadcaster = Broadcaster(self)
+        QApplication.instance().aboutToQuit.connect(self.broadcaster.close)
         self.aruco_detector.launch_analyzer(self.broadcaster)
 
+        # embedded view, only woken up when the broadcaster hands over a new frame
+        self.ivf = ImageViewFrame(self.broadcaster.frames, self.widget)
+        self.ivf.setMinimumSize(320, 180)
+        self.widget.gridLayout_3.addWidget(self.ivf, 1, 0)
+        # the form's layout already accounts for the view's minimum size
+        self.setMinimumSize(self.widget.minimumSizeHint())
+
         self.broadcaster.updateX.connect(self.widget.leX.setText)
         self.broadcaster.updateY.connect(self.widget.leY.setText)
         self.broadcaster.updateZ.connect(self.widget.leZ.setText)
@@ -87,6 +99,10 @@ class ArUcoTesterWidget(QWidget):
         base_dir = os.path.dirname(os.path.realpath(__file__))
         fileName = os.path.join(base_dir, str(self.targetAngle))
         fileName, _ = QFileDialog.getSaveFileName(self, 'Save data', fileName)
+        if fileName == '':
+            # dialog cancelled, the recording stays for another try
+            self.widget.pbSaveToFile.setEnabled(True)
+            return
         self.broadcaster.saveToFile(fileName)
 
     @Slot()
@@ -99,6 +115,9 @@ class ArUcoTesterWidget(QWidget):
     def setTargetAngle(self, angle):
         self.targetAngle = angle
 
+    def resizeEvent(self, event):
+        self.widget.resize(event.size())
+
 import math
 
 class Broadcaster(QObject):
@@ -114,41 +133,34 @@ class Broadcaster(QObject):
     updateTimestamp = Signal(str)
 
     recordingStopped = Signal()
-    stopTimer = Signal()
 
-    sample_counter = 0
     max_samples = 100
     timeout = 5000
 
     desiredSample = 'C000'
 
-    image = None
-
     def __init__(self, parent):
         super(Broadcaster, self).__init__()
         self.parent = parent
-        self.record = False
-        self.recordedSamples = list()
-        self.timer = QTimer(self)
-        self.timer.setInterval(self.timeout)
-        self.timer.timeout.connect(self.stopRecording)
-        self.stopTimer.connect(self.timer.stop)
+        self.frames = FrameMailbox()
 
-        self.thread = threading.Thread(target=self.showImage, args=[])
-        self.thread.daemon = True
-        self.thread.start()
+        self.core = PoseBroadcaster()
+        self.core.set_desired_object(self.desiredSample)
+        self.core.on_pose = self.emit_target
+        self.core.on_stopped = self.recordingStopped.emit
+        self.settle = self.core.settle
 
+    @property
+    def sample_counter(self):
+        return self.core.sample_counter
 
     def broadcast(self, target):
-        if not target.get_unique_ar_id_string() == self.desiredSample:
-            return
+        self.core.broadcast(target)
+
+    def emit_target(self, target, snapshot):
         pos = target.position
         ori = list(map(math.degrees, target.euler))
-        # cv2.namedWindow('image', cv2.WINDOW_NORMAL)
-        # cv2.resizeWindow('image', 1280, 720)
-        # cv2.imshow('image', target.image)
-        # cv2.waitKey(1)
-        self.image = target.image
+        self.frames.put((getattr(target, 'image', None), snapshot.trace))
 
         self.updateX.emit('{: 5.3f}'.format(pos[0]))
         self.updateY.emit('{: 5.3f}'.format(pos[1]))
@@ -158,47 +170,29 @@ class Broadcaster(QObject):
         self.updateRoll.emit('{: 5.3f}'.format(ori[2]))
 
         self.updateTimestamp.emit('{: 5.3f}'.format(time.time() - target.timestamp))
-        if self.record is True:
-            if self.sample_counter < self.max_samples:
-                self.sample_counter += 1
-                self.recordedSamples.append(target)
-            else:
-                self.stopTimer.emit()
-                self.stopRecording()
 
     def startRecording(self):
-        self.record = True
-        self.recordedSamples = list()
-        self.sample_counter = 0
-        self.timer.start()
+        self.core.startRecording(self.max_samples, self.timeout)
 
     @Slot()
     def stopRecording(self):
-        print('{}/{} samples recorded'.format(self.sample_counter, self.max_samples))
-        self.record = False
-        self.recordingStopped.emit()
+        self.core.stopRecording()
 
     def saveToFile(self, fileName):
-        dir_path = os.path.dirname(os.path.realpath(fileName))
-        dir = QDir('/')
-        dir.mkpath(dir_path)
-        file = QSaveFile(fileName)
-        if file.open(QFile.WriteOnly):
-            out = QTextStream(file)
-            for sample in self.recordedSamples:
-                out << sample.toCSV() << '\n'
-            file.commit()
-            self.recordedSamples = list()
-        else:
-            print('ERROR: failed to open file')
-            print(file.error())
+        return self.core.saveToFile(fileName)
+
+    def takeRecording(self):
+        return self.core.takeRecording()
+
+    @Slot()
+    def close(self):
+        self.core.close()
+
+    def summary(self):
+        return self.core.summary()
+
+    def set_stopping_rule(self, rule):
+        self.core.set_stopping_rule(rule)
 
     def isRecording(self):
-        return self.record
-
-    def showImage(self):
-        while True:
-            if self.image is not None:
-                cv2.imshow('image', self.image)
-                self.image = None
-            time.sleep(0.001)
\ No newline at end of file
+        return self.core.record
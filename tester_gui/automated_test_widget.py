@@ -1,11 +1,16 @@
 import os
 import sys
-import time
 import yaml
-from PySide2.QtWidgets import QWidget, QFileDialog
+import logging
+from threading import Event
+from PySide2.QtWidgets import QWidget, QFileDialog, QMessageBox
 from PySide2.QtCore import Signal, Slot, QFile, QSaveFile, QTextStream, QObject, QThread, QWaitCondition, QMutex
 from PySide2.QtUiTools import QUiLoader
 
+from core.sweep_writer import SweepWriter
+from core.sweep_plan import plan_sweep, plan_signature, Checkpoint
+from core.online_stats import sequential_stop
+
 
 class AutomatedTestWidget(QWidget):
     config = None
@@ -35,74 +40,146 @@ class AutomatedTestWidget(QWidget):
         try:
             file = open(fileName)
             self.config = yaml.load(file)
-            self.widget.pbStart.setEnabled(True)
             file.close()
             print(self.config)
+            # max_samples is the sweep's, not the stopping rule's
+            sequential_stop(self.config.get('adaptive'), ('max_samples',))
+            self.widget.pbStart.setEnabled(True)
         except IOError as ioe:
             print(ioe)
+        except ValueError as e:
+            print(e)
+            QMessageBox.critical(self, 'Error', str(e), QMessageBox.Ok)
 
     @Slot()
     def onStartClicked(self):
         self.widget.pbStart.setEnabled(False)
         self.thread = TestThread(self.config, self.aruco_tester_widget, self.acs_control_widget.controller, self)
         self.aruco_tester_widget.broadcaster.recordingStopped.connect(self.thread.wake)
+        self.thread.boardChangeRequested.connect(self.onBoardChangeRequested)
         self.thread.start()
 
+    @Slot(str)
+    def onBoardChangeRequested(self, board):
+        QMessageBox.information(self, 'Change board', 'Mount {} on the turntable and press OK.'.format(board))
+        self.thread.boardMounted()
+
 class TestThread(QThread):
     startRecording = Signal()
+    boardChangeRequested = Signal(str)
+    logger = logging.getLogger('aruco_analyzer.gui.AutomatedTestWidget')
 
     def __init__(self, config, aruco_tester_widget, acs_control, parent=None):
         QThread.__init__(self, parent)
         self.config = config
         self.aruco_tester_widget = aruco_tester_widget
-        self.image_miner = aruco_tester_widget.image_miner
+        # filled once the detector has created its miners
+        self.image_miners = aruco_tester_widget.image_miner_module.instances
         self.acs_control = acs_control
 
         self.startRecording.connect(self.aruco_tester_widget.onRecordClicked)
 
         self.recordingStopped = QWaitCondition()
         self.mutex = QMutex()
+        self.boardMountedEvent = Event()
+        self.camera_settings = {}
 
     @Slot()
     def wake(self):
         self.recordingStopped.wakeAll()
         pass
 
+    def moveAndWaitForRest(self, angle, max_wait):
+        # False if the turntable did not reach the angle
+        if not self.acs_control.move_to(angle):
+            return False
+        # the drive reaching its target does not mean the object stopped swinging
+        settle = self.aruco_tester_widget.broadcaster.settle
+        settle.reset()
+        if not settle.wait(max_wait):
+            self.logger.warning('not at rest after {}s, recording anyway'.format(max_wait))
+        return True
+
+    @Slot()
+    def boardMounted(self):
+        self.boardMountedEvent.set()
+
+    def mountBoard(self, board):
+        # boards are swapped by hand, the sweep waits for the confirmation
+        if board == self.aruco_tester_widget.use_board:
+            return
+        if not self.acs_control.move_to(0):
+            self.logger.warning('turntable did not return to 0 for the board change')
+        self.boardMountedEvent.clear()
+        self.boardChangeRequested.emit(board)
+        self.boardMountedEvent.wait()
+        self.aruco_tester_widget.use_board = board
+
+    def applySettings(self, settings):
+        # only the properties that differ from the current setting are touched
+        if settings and not self.image_miners:
+            self.logger.warning('no image miner running, camera settings not applied')
+        for prop, value in settings:
+            if self.camera_settings.get(prop) != value:
+                for image_miner in self.image_miners:
+                    image_miner.set_video_capture_property(prop, value/100.)
+                self.camera_settings[prop] = value
+
     def run(self):
         print('starting...')
-        base_dir = os.path.dirname(os.path.realpath(__file__))
-        config = self.config['config']
-        angles = self.config['angles']
-        j = 0
-            
-        self.image_miner.set_video_capture_property('CAP_PROP_BRIGHTNESS', 50.5/100.)
-        self.image_miner.set_video_capture_property('CAP_PROP_CONTRAST', 50.5/100.)
-        self.image_miner.set_video_capture_property('CAP_PROP_SATURATION', 50.5/100.)
-
-        prop = 'CAP_PROP_BRIGHTNESS'
-
-        print(prop)
-        start = config[prop]['start']
-        end = config[prop]['end']
-        step = config[prop]['step']
-        for i in range(start, end+1, step):
-            print(i)
-            self.image_miner.set_video_capture_property(prop, i/100.)
-            series_dir = os.path.join(base_dir, str(prop), str(i), str(self.aruco_tester_widget.use_board))
-            j += 1
-            
-            for angle in angles:
-                fileName = os.path.join(series_dir, str(angle))
-                print(angle)
-                self.acs_control.pa(angle)
-                time.sleep(5)
+        base_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), self.config.get('output', ''))
+
+        settle = self.config.get('settle', {})
+        self.aruco_tester_widget.broadcaster.settle.configure(
+            settle.get('window'), settle.get('rotation_rate'), settle.get('position_std'))
+        max_wait = settle.get('max_wait', 10.)
+
+        broadcaster = self.aruco_tester_widget.broadcaster
+        # the sweep's maximum only applies to its own recordings
+        max_samples = broadcaster.max_samples
+        adaptive = self.config.get('adaptive') or {}
+        if 'max_samples' in adaptive:
+            broadcaster.max_samples = adaptive['max_samples']
+        broadcaster.set_stopping_rule(sequential_stop(adaptive, ('max_samples',)))
+
+        default_board = self.aruco_tester_widget.use_board
+        cells = plan_sweep(self.config, default_board)
+        checkpoint = Checkpoint(os.path.join(base_dir, 'sweep_checkpoint.json'),
+                                plan_signature(self.config, default_board))
+        remaining = checkpoint.remaining(cells)
+        print('{} of {} recordings to do'.format(len(remaining), len(cells)))
+
+        # a cell counts as done once its file is on disk
+        def saved(stats):
+            checkpoint.mark(os.path.relpath(stats.fileName, base_dir))
+        # recordings are written while the turntable moves on
+        writer = SweepWriter(self.config.get('write_queue', 4), saved, os.path.join(base_dir, 'summary.csv'))
+
+        try:
+            self.camera_settings = {}
+            for cell in remaining:
+                self.mountBoard(cell.board)
+                self.applySettings(cell.settings)
+                fileName = os.path.join(base_dir, cell.path)
+                print(cell.path)
+                if not self.moveAndWaitForRest(cell.angle, max_wait):
+                    # left out of the checkpoint, a resumed sweep tries it again
+                    self.logger.error('turntable did not reach {}, skipping {}'.format(cell.angle, cell.path))
+                    continue
                 self.mutex.lock()
                 self.startRecording.emit()
                 print('wait for recording to stop')
                 self.recordingStopped.wait(self.mutex)
                 print('saving data to {}'.format(fileName))
-                self.aruco_tester_widget.broadcaster.saveToFile(fileName)
+                samples = broadcaster.takeRecording()
+                stats = broadcaster.summary()
                 self.mutex.unlock()
-
-            self.acs_control.pa(0)
-            time.sleep(10)
+                writer.save(fileName, samples, stats)
+
+            if not self.acs_control.move_to(0):
+                self.logger.error('turntable did not return to 0')
+        finally:
+            writer.close()
+            broadcaster.set_stopping_rule(None)
+            broadcaster.max_samples = max_samples
+        print('sweep done')
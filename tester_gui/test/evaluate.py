@@ -1,11 +1,14 @@
 #!/usr/bin/env python
 
 import os
+import sys
 import math
 import numpy as np
 from scipy import stats
-import pyquaternion as pq
-from quaternion_helper import averageQuaternions, quaternion_distance
+from quaternion_helper import averageQuaternions
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+from core.recording_format import load, list_recordings
+from core import pose
 from natsort import natsorted
 import matplotlib.pyplot as plt
 
@@ -20,7 +23,7 @@ def plot_distance():
     base_path = os.path.dirname(os.path.realpath(__file__))
     series_path = os.path.join(base_path, property)
     board_path = os.path.join(series_path, board)
-    values = natsorted(os.listdir(board_path))
+    values = natsorted(list_recordings(board_path))
 
     results = {}
     results[board] = np.array([])
@@ -29,13 +32,12 @@ def plot_distance():
         value_path = os.path.join(board_path, value)
         target_distance = float(value) / 10.
 
-        with open(value_path) as csv_file:
-            data = np.genfromtxt(csv_file, delimiter=',')
-            avg = np.average(data[:,3])*100
-            std = np.std(data[:,3])
-            error = target_distance - avg
-            results[board] = np.append(results[board], error)
-            print('{}={:.3f}: avg: {:.3f}, std: {:.3f}'.format(property, target_distance, error, std))
+        data = load(value_path)
+        avg = np.average(data['position'][:,2])*100
+        std = np.std(data['position'][:,2])
+        error = target_distance - avg
+        results[board] = np.append(results[board], error)
+        print('{}={:.3f}: avg: {:.3f}, std: {:.3f}'.format(property, target_distance, error, std))
 
     distances = [float(value)/10. for value in values]
     errors = results[board]
@@ -63,37 +65,36 @@ def plot_property(board, property):
     base_path = os.path.dirname(os.path.realpath(__file__))
     series_path = os.path.join(base_path, property)
     board_path = os.path.join(series_path, board)
-    values = natsorted(os.listdir(board_path))
+    values = natsorted(list_recordings(board_path))
 
     results = {}
 
     for value in values:
         results[value] = np.array([])
         value_path = os.path.join(board_path, value)
-        angles = natsorted(os.listdir(value_path))
+        angles = natsorted(list_recordings(value_path))
 
         for angle in angles:
             angle_path = os.path.join(value_path, angle)
 
-            with open(angle_path) as csv_file:
-                data = np.genfromtxt(csv_file, delimiter=',')
-                avg = np.average(data[:,1])
-                std = np.std(data[:,1])
-                average_quat = averageQuaternions(data[:,4:])
-                average_quat = pq.Quaternion(average_quat)
+            data = load(angle_path)
+            avg = np.average(data['position'][:,0])
+            std = np.std(data['position'][:,0])
+            average_quat = averageQuaternions(data['quaternion'])
+            average_quat = pose.normalize(average_quat)
 
-                if angle == angles[0]:
-                    reference_quat = average_quat
+            if angle == angles[0]:
+                reference_quat = average_quat
 
-                desired_angle = int(angle)
-                distance = quaternion_distance(reference_quat, average_quat, u='deg')
+            desired_angle = int(angle)
+            distance = math.degrees(pose.distance(reference_quat, average_quat))
                 
-                if desired_angle < 180:
-                    error = desired_angle - distance
-                else:
-                    error = desired_angle - 360 + distance
+            if desired_angle < 180:
+                error = desired_angle - distance
+            else:
+                error = desired_angle - 360 + distance
 
-                results[value] = np.append(results[value], error)
+            results[value] = np.append(results[value], error)
 
         avg = np.average(results[value])
         std = np.std(results[value])
@@ -141,7 +142,7 @@ def plot_property_summary():
         for j, s in enumerate(series):
             series_path = os.path.join(base_path, s)
             board_path = os.path.join(series_path, board)
-            values = natsorted(os.listdir(board_path))
+            values = natsorted(list_recordings(board_path))
 
             avg_list = list()
             std_list = list()
@@ -150,32 +151,30 @@ def plot_property_summary():
             for value in values:
                 results[value] = np.array([])
                 value_path = os.path.join(board_path, value)
-                angles = natsorted(os.listdir(value_path))
+                angles = natsorted(list_recordings(value_path))
 
                 for angle in angles:
                     angle_path = os.path.join(value_path, angle)
 
-                    with open(angle_path) as csv_file:
-
-                        data = np.genfromtxt(csv_file, delimiter=',')
-                        avg = np.average(data[:,1])
-                        std = np.std(data[:,1])
+                    data = load(angle_path)
+                    avg = np.average(data['position'][:,0])
+                    std = np.std(data['position'][:,0])
 
-                        average_quat = averageQuaternions(data[:,4:])
-                        average_quat = pq.Quaternion(average_quat)
+                    average_quat = averageQuaternions(data['quaternion'])
+                    average_quat = pose.normalize(average_quat)
 
-                        if angle == angles[0]:
-                            reference_quat = average_quat
+                    if angle == angles[0]:
+                        reference_quat = average_quat
 
-                        desired_angle = int(angle)
-                        distance = quaternion_distance(reference_quat, average_quat, u='deg')
+                    desired_angle = int(angle)
+                    distance = math.degrees(pose.distance(reference_quat, average_quat))
                         
-                        if desired_angle < 180:
-                            error = desired_angle - distance
-                        else:
-                            error = desired_angle - 360 + distance
+                    if desired_angle < 180:
+                        error = desired_angle - distance
+                    else:
+                        error = desired_angle - 360 + distance
 
-                        results[value] = np.append(results[value], error)
+                    results[value] = np.append(results[value], error)
 
                 avg = np.average(results[value])
                 std = np.std(results[value])
@@ -199,7 +198,7 @@ def plot():
     series = '5'
     base_path = os.path.dirname(os.path.realpath(__file__))
     series_path = os.path.join(base_path, series)
-    markers = natsorted(os.listdir(series_path))
+    markers = natsorted(list_recordings(series_path))
     markers.remove('meta')
 
     cols = math.ceil(math.sqrt(len(markers)))
@@ -234,33 +233,32 @@ def plot():
             print('marker not found')
             continue
         results[marker] = np.array([])
-        angles = natsorted(os.listdir(marker_path))
+        angles = natsorted(list_recordings(marker_path))
         angles = list(filter(lambda s: s.isdigit(), angles))
 
-        reference_quat = pq.Quaternion()
+        reference_quat = np.array([1., 0., 0., 0.])
         for angle in angles:
             desired_angle = int(angle)
             file = os.path.join(marker_path, angle)
 
-            with open(file) as csv_file:
-                data = np.genfromtxt(csv_file, delimiter=',')
-                avg = np.average(data[:,1])
-                std = np.std(data[:,1])
-                average_quat = averageQuaternions(data[:,4:])
-                average_quat = pq.Quaternion(average_quat)
+            data = load(file)
+            avg = np.average(data['position'][:,0])
+            std = np.std(data['position'][:,0])
+            average_quat = averageQuaternions(data['quaternion'])
+            average_quat = pose.normalize(average_quat)
 
-                if angle == angles[0]:
-                    reference_quat = average_quat
+            if angle == angles[0]:
+                reference_quat = average_quat
 
-                distance = quaternion_distance(reference_quat, average_quat, u='deg')
+            distance = math.degrees(pose.distance(reference_quat, average_quat))
 
-                if desired_angle < 180:
-                    error = desired_angle - distance
-                else:
-                    error = desired_angle - 360 + distance
+            if desired_angle < 180:
+                error = desired_angle - distance
+            else:
+                error = desired_angle - 360 + distance
 
-                results[marker] = np.append(results[marker], error)
-                print('angle {:3}: {:.3f}'.format(desired_angle, error))
+            results[marker] = np.append(results[marker], error)
+            print('angle {:3}: {:.3f}'.format(desired_angle, error))
 
         avg = np.average(results[marker])
         std = np.std(results[marker])
@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+import pytest
+import pyquaternion as pq
+
+from core import pose
+from core import recording_format
+from core.ring_buffer import RingBuffer
+from core.online_stats import OnlineStats
+from core.rate_estimator import RateEstimator
+from core.recording_buffer import RecordingBuffer
+
+def random_quaternions(count, seed=0):
+    return pose.normalize(np.random.RandomState(seed).normal(size=(count, 4)))
+
+def test_multiply_rotate_inverse_match_pyquaternion():
+    a, b = random_quaternions(2)
+    v = np.array([0.3, -1.2, 2.])
+    expected = pq.Quaternion(a) * pq.Quaternion(b)
+    assert np.allclose(pose.multiply(a, b), expected.elements)
+    assert np.allclose(pose.rotate(a, v), pq.Quaternion(a).rotate(v))
+    assert np.allclose(pose.inverse(a), pq.Quaternion(a).inverse.elements)
+    assert np.allclose(pose.to_matrix(a), pq.Quaternion(a).rotation_matrix)
+
+def test_euler_angle_and_distance_match_pyquaternion():
+    quaternions = random_quaternions(50)
+    eulers = pose.to_euler(quaternions)
+    angles = pose.angle(quaternions)
+    for q, euler, angle in zip(quaternions, eulers, angles):
+        assert np.allclose(euler, pq.Quaternion(q).yaw_pitch_roll)
+        assert np.isclose(angle, pq.Quaternion(q).angle)
+    a, b = quaternions[:2]
+    assert np.isclose(pose.distance(a, b), abs((pq.Quaternion(a).inverse * pq.Quaternion(b)).angle))
+
+def test_slerp_matches_pyquaternion():
+    a, b = random_quaternions(2, seed=1)
+    for t in (0., 0.25, 0.5, 1.):
+        expected = pq.Quaternion.slerp(pq.Quaternion(a), pq.Quaternion(b), t).elements
+        result = pose.slerp(a, b, t)
+        # q and -q are the same attitude
+        assert np.allclose(result, expected) or np.allclose(result, -expected)
+
+def test_batched_and_single_quaternions_agree():
+    quaternions = random_quaternions(5)
+    batched = pose.multiply(quaternions, quaternions[::-1])
+    for i in range(5):
+        assert np.allclose(batched[i], pose.multiply(quaternions[i], quaternions[4 - i]))
+
+def test_ring_buffer_wraps_around():
+    buffer = RingBuffer(4)
+    for i in range(3):
+        buffer.push(i)
+    assert buffer.drain(2) == [0, 1]
+    for i in range(3, 6):
+        assert buffer.push(i)
+    assert len(buffer) == 4
+    assert buffer.drain() == [2, 3, 4, 5]
+    assert len(buffer) == 0
+    assert buffer.pushed == 6
+
+def test_ring_buffer_drops_on_overflow():
+    buffer = RingBuffer(3)
+    pushed = [buffer.push(i) for i in range(5)]
+    assert pushed == [True, True, True, False, False]
+    assert buffer.dropped == 2
+    assert buffer.drain() == [0, 1, 2]
+
+def test_online_stats_match_numpy():
+    samples = np.random.RandomState(2).normal(size=(200, 3)) * [1., 10., 0.1] + [5., -2., 0.]
+    stats = OnlineStats(3)
+    for sample in samples:
+        stats.add(sample)
+    assert stats.count == 200
+    assert np.allclose(stats.mean, samples.mean(axis=0))
+    assert np.allclose(stats.covariance(), np.cov(samples.T))
+    assert np.allclose(stats.std() ** 2, samples.var(axis=0, ddof=1))
+    assert np.allclose(stats.standard_error(), samples.std(axis=0, ddof=1) / np.sqrt(200))
+
+def test_online_stats_without_samples():
+    stats = OnlineStats(2)
+    stats.add([1., 2.])
+    assert np.all(np.isnan(stats.covariance()))
+
+def test_rate_estimator_steady_between_arrivals():
+    rates = RateEstimator()
+    for i in range(20):
+        rates.add(i * 0.1)
+    # queried anywhere before the next detection is due, nothing changes
+    for now in (1.9, 1.95, 2.05, 2.1):
+        stats = rates.stats(now)
+        assert np.isclose(stats.ewma, 10.)
+        assert np.isclose(stats.instantaneous, 10.)
+        assert np.isclose(stats.rate, 10.)
+
+def test_rate_estimator_decays_and_ages_out():
+    rates = RateEstimator(max_age=5.)
+    for i in range(20):
+        rates.add(i * 0.1)
+    stats = rates.stats(2.9)
+    assert np.isclose(stats.ewma, 1.)
+    assert np.isclose(stats.max_gap, 1.)
+    assert np.isclose(stats.instantaneous, 10.)
+    assert rates.stats(8.) is None
+
+def recording(count):
+    buffer = RecordingBuffer()
+    quaternions = random_quaternions(count, seed=3)
+    for i in range(count):
+        buffer.append('M{:03d}'.format(i % 3), 100. + i, [i, 2. * i, -i], quaternions[i])
+    return buffer.samples
+
+def test_binary_recording_round_trip(tmpdir):
+    samples = recording(10)
+    fileName = os.path.join(str(tmpdir), 'recording.npy')
+    recording_format.save(fileName, samples)
+    loaded = recording_format.load(fileName)
+    assert loaded.dtype == samples.dtype
+    assert np.array_equal(loaded, samples)
+    assert not os.path.exists(fileName + '.part')
+
+def test_csv_recording_round_trip(tmpdir):
+    samples = recording(10)
+    fileName = os.path.join(str(tmpdir), 'recording')
+    recording_format.save(fileName, samples)
+    loaded = recording_format.load(fileName)
+    assert np.array_equal(loaded['id'], samples['id'])
+    assert np.allclose(loaded['position'], samples['position'])
+    assert np.allclose(loaded['quaternion'], samples['quaternion'])
+    # the CSV layout has no timestamps
+    assert np.all(np.isnan(loaded['timestamp']))